@@ -3,20 +3,41 @@ Main module for BigQuery data loading operations.
 """
 
 from google.cloud import bigquery
+from google.cloud import bigquery_storage_v1
+from google.cloud.bigquery_storage_v1 import types, writer
 from google.oauth2 import service_account
 from typing import Optional, List, Dict, Any
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import csv
 import os
-from tqdm import tqdm
+import tempfile
 import logging
+import logging.handlers
 from datetime import datetime
-import csv
 
 # Configure logging
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# basicConfig only formats the handlers it is given, so the file handler
+# wrapped by the MemoryHandler needs its own formatter
+log_file_handler = logging.FileHandler("bq_loader.log")
+log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("bq_loader.log"), logging.StreamHandler()],
+    format=LOG_FORMAT,
+    handlers=[
+        # buffer file writes so bursts of warnings are flushed together
+        logging.handlers.MemoryHandler(
+            capacity=1024,
+            flushLevel=logging.ERROR,
+            target=log_file_handler,
+        ),
+        logging.StreamHandler(),
+    ],
 )
 logger = logging.getLogger(__name__)
 
@@ -27,7 +48,105 @@ CSV_FILE = "product_data_2025-07-17.csv"
 DATASET_ID = "shopchannel"
 RAW_TABLE_ID = "products_raw"
 FILTERED_TABLE_ID = "products"
-BATCH_SIZE = 10000
+CSV_BLOCK_SIZE = 32 << 20  # 32 MB per parse block
+MAX_LOGGED_BAD_ROWS = 10
+# Stream the raw table through the Storage Write API instead of a load job
+USE_STORAGE_WRITE_API = False
+APPEND_ROWS_REQUEST_BYTES = 8 << 20  # stay under the 10 MB AppendRows limit
+
+# Map Thai column names to English
+COLUMN_MAPPING = {
+    "ID": "record_id",
+    "รหัสสินค้า": "product_number",
+    "ชื่อ": "product_name",
+    "เผยแพร่แล้ว": "is_published",
+    "คำอธิบาย": "description",
+    "วันเริ่มต้นลดราคา": "sale_start_date",
+    "วันสิ้นสุดการลดราคา": "sale_end_date",
+    "คลังสินค้า": "stock",
+    "ราคาที่ลด": "sale_price",
+    "ราคาปกติ": "regular_price",
+    "หมวดหมู่": "category",
+    "Brands": "brands",
+    "ไฟล์รูปภาพ": "image_uri",
+    "Custom URI": "custom_uri",
+}
+
+# Raw table schema, shared by every load job
+SCHEMA = [
+    bigquery.SchemaField("record_id", "STRING"),
+    bigquery.SchemaField("product_number", "STRING"),
+    bigquery.SchemaField("product_name", "STRING"),
+    bigquery.SchemaField("is_published", "STRING"),
+    bigquery.SchemaField("description", "STRING"),
+    bigquery.SchemaField("sale_start_date", "STRING"),
+    bigquery.SchemaField("sale_end_date", "STRING"),
+    bigquery.SchemaField("stock", "STRING"),
+    bigquery.SchemaField("sale_price", "STRING"),
+    bigquery.SchemaField("regular_price", "STRING"),
+    bigquery.SchemaField("category", "STRING"),
+    bigquery.SchemaField("brands", "STRING"),
+    bigquery.SchemaField("image_uri", "STRING"),
+    bigquery.SchemaField("custom_uri", "STRING"),
+    bigquery.SchemaField("is_product_variation", "STRING"),
+]
+
+
+def _read_column_names(csv_file_path: str, encoding: str) -> List[str]:
+    """Read the CSV header and return its column names, cleaned and mapped to English."""
+    with open(csv_file_path, encoding=encoding, newline="") as f:
+        header = next(csv.reader(f, escapechar="\\"), [])
+    if header:
+        # Exports often start with a UTF-8 byte order mark, which a plain
+        # open() keeps on the first column name
+        header[0] = header[0].lstrip("\ufeff")
+    names = [col.strip().replace("\r", "") for col in header]
+
+    missing = [col for col in COLUMN_MAPPING if col not in names]
+    if missing:
+        logger.error(f"Missing columns in CSV: {missing}")
+        raise ValueError(f"Missing columns in CSV: {missing}")
+
+    return [COLUMN_MAPPING.get(col, col) for col in names]
+
+
+def _clean_description(column: pa.Array) -> pa.Array:
+    """Convert every newline form in the description column to <br/>."""
+    # First, normalize all newlines to \n
+    column = pc.replace_substring_regex(column, r"\r\n|\r", "\n")
+
+    # Handle the case where \n is written as literal characters
+    column = pc.replace_substring(column, "\\\\n", "<br/>")  # Handle escaped backslash
+    column = pc.replace_substring(column, "\\n", "<br/>")  # Handle regular \n
+
+    # Replace any remaining actual newlines with <br/>
+    column = pc.replace_substring(column, "\n", "<br/>")
+
+    # Clean up any remaining 'n' characters that might appear after <br/>
+    return pc.replace_substring(column, "<br/>n", "<br/>")
+
+
+def _clean_newlines(column: pa.Array) -> pa.Array:
+    """Replace each line break in a column with a single space."""
+    return pc.replace_substring_regex(column, r"\r\n|[\r\n]", " ")
+
+
+def _clean_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """Clean the values of a parsed CSV batch."""
+    names = batch.schema.names
+    columns = []
+    for name, column in zip(names, batch.columns):
+        if name == "description":
+            column = _clean_description(column)
+        else:
+            column = _clean_newlines(column)
+        if name == "record_id":
+            column = pc.utf8_trim_whitespace(column)
+        elif name == "product_number":
+            # some product number use "+", " " or "*" as the variation separator
+            column = pc.replace_substring_regex(column, r"[ +*]", "-")
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, names=names)
 
 
 class BigQueryLoader:
@@ -47,6 +166,7 @@ class BigQueryLoader:
             credentials=credentials,
             project=project_id,
         )
+        self.credentials = credentials
         self.project_id = project_id
 
     def test_connection(self) -> bool:
@@ -64,87 +184,126 @@ class BigQueryLoader:
             logger.error(f"Connection test failed: {e}")
             return False
 
-    def _process_batch(
+    def _upload_file(
         self,
-        df_batch: pd.DataFrame,
+        file_path: str,
         full_table_id: str,
         job_config: bigquery.LoadJobConfig,
-        batch_num: int,
-        total_batches: int,
-    ) -> bool:
+    ) -> bigquery.LoadJob:
         """
-        Process a single batch of data.
+        Upload a local file to BigQuery as a single load job.
 
         Args:
-            df_batch: DataFrame containing the batch data
+            file_path: Path to the file in job_config's source format
             full_table_id: Full BigQuery table ID
             job_config: BigQuery job configuration
-            batch_num: Current batch number
-            total_batches: Total number of batches
 
         Returns:
-            bool: True if batch was processed successfully
+            bigquery.LoadJob: The completed load job
         """
-        try:
-            # Rename 'id' column to 'record_id' if it exists
-            if "id" in df_batch.columns:
-                df_batch = df_batch.rename(columns={"id": "record_id"})
-
-            job = self.client.load_table_from_dataframe(
-                df_batch, full_table_id, job_config=job_config
+        with open(file_path, "rb") as fp:
+            job = self.client.load_table_from_file(
+                fp, full_table_id, job_config=job_config
             )
-            job.result()
-            logger.info(f"Batch {batch_num}/{total_batches} uploaded successfully")
-            return True
-        except Exception as e:
-            logger.error(f"Error uploading batch {batch_num}/{total_batches}: {str(e)}")
-            return False
+        job.result()
+        return job
 
-    def _read_csv_safely(
-        self, file_path: str, encoding: str = "utf-8"
-    ) -> List[Dict[str, Any]]:
+    def _append_rows(
+        self,
+        table: pa.Table,
+        dataset_id: str,
+        table_id: str,
+        write_disposition: str,
+    ) -> None:
         """
-        Safely read CSV file handling inconsistent columns.
+        Stream an Arrow table into BigQuery through the Storage Write API.
 
-        Args:
-            file_path: Path to the CSV file
-            encoding: File encoding
+        Rows are appended to a pending stream and committed together, so an
+        append only becomes visible once every batch has been accepted. For
+        WRITE_TRUNCATE the stream is committed into a staging table first, and
+        a query job then replaces the target from it, so a failed upload
+        leaves the existing rows in place.
 
-        Returns:
-            List of dictionaries containing the data
+        Args:
+            table: Arrow table matching SCHEMA
+            dataset_id: BigQuery dataset ID
+            table_id: BigQuery table ID
+            write_disposition: 'WRITE_TRUNCATE' or 'WRITE_APPEND'
         """
-        data = []
-        expected_columns = None
-
-        with open(file_path, "r", encoding=encoding) as f:
-            csv_reader = csv.reader(f)
-            headers = next(csv_reader)  # Get headers
-            # Rename 'id' column to 'record_id'
-            headers = ["record_id" if h == "id" else h for h in headers]
-            expected_columns = len(headers)
-
-            for row_num, row in enumerate(
-                csv_reader, start=2
-            ):  # start=2 because we already read header
-                try:
-                    if len(row) != expected_columns:
-                        logger.warning(
-                            f"Line {row_num}: Expected {expected_columns} columns, got {len(row)}. Truncating/expanding row."
-                        )
-                        # Truncate or expand row to match expected columns
-                        if len(row) > expected_columns:
-                            row = row[:expected_columns]
-                        else:
-                            row.extend([""] * (expected_columns - len(row)))
-
-                    # Convert row to dictionary
-                    row_dict = dict(zip(headers, row))
-                    data.append(row_dict)
-                except Exception as e:
-                    logger.error(f"Error processing line {row_num}: {str(e)}")
-                    continue
+        if write_disposition not in ("WRITE_TRUNCATE", "WRITE_APPEND"):
+            raise ValueError(
+                f"Unsupported write disposition for the Storage Write API: {write_disposition}"
+            )
 
-        return data
+        full_table_id = f"{self.project_id}.{dataset_id}.{table_id}"
+        if write_disposition == "WRITE_TRUNCATE":
+            stream_table_id = f"{table_id}_staging"
+            full_stream_table_id = f"{self.project_id}.{dataset_id}.{stream_table_id}"
+            # Start from an empty staging table so rows left by a failed run
+            # are never swapped in
+            self.client.delete_table(full_stream_table_id, not_found_ok=True)
+        else:
+            stream_table_id = table_id
+            full_stream_table_id = full_table_id
+        self.client.create_table(
+            bigquery.Table(full_stream_table_id, schema=SCHEMA), exists_ok=True
+        )
+
+        write_client = bigquery_storage_v1.BigQueryWriteClient(
+            credentials=self.credentials
+        )
+        parent = write_client.table_path(self.project_id, dataset_id, stream_table_id)
+        write_stream = write_client.create_write_stream(
+            parent=parent,
+            write_stream=types.WriteStream(type_=types.WriteStream.Type.PENDING),
+        )
+
+        request_template = types.AppendRowsRequest()
+        request_template.write_stream = write_stream.name
+        request_template.arrow_rows.writer_schema.serialized_schema = (
+            table.schema.serialize().to_pybytes()
+        )
+        append_rows_stream = writer.AppendRowsStream(write_client, request_template)
+
+        # Size each request from the table's average row width
+        rows_per_request = max(
+            1, table.num_rows * APPEND_ROWS_REQUEST_BYTES // max(1, table.nbytes)
+        )
+        try:
+            futures = []
+            for batch in table.to_batches(max_chunksize=rows_per_request):
+                request = types.AppendRowsRequest()
+                request.arrow_rows.rows.serialized_record_batch = (
+                    batch.serialize().to_pybytes()
+                )
+                futures.append(append_rows_stream.send(request))
+            for future in futures:
+                future.result()
+        finally:
+            append_rows_stream.close()
+        write_client.finalize_write_stream(name=write_stream.name)
+
+        response = write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(
+                parent=parent, write_streams=[write_stream.name]
+            )
+        )
+        if response.stream_errors:
+            raise RuntimeError(
+                f"Failed to commit write stream: {response.stream_errors}"
+            )
+
+        if write_disposition == "WRITE_TRUNCATE":
+            # One query job reads the committed staging rows and replaces the
+            # target table in a single step
+            job_config = bigquery.QueryJobConfig(
+                destination=full_table_id,
+                write_disposition="WRITE_TRUNCATE",
+            )
+            self.client.query(
+                f"SELECT * FROM `{full_stream_table_id}`", job_config=job_config
+            ).result()
+            self.client.delete_table(full_stream_table_id, not_found_ok=True)
 
     def load_csv_to_bigquery(
         self,
@@ -155,10 +314,10 @@ class BigQueryLoader:
         write_disposition: str = "WRITE_TRUNCATE",
         autodetect_schema: bool = False,
         encoding: str = "utf-8",
-        batch_size: int = 10000,
         error_file: str = "error_rows.csv",
         test_mode: bool = False,
         test_rows: int = 100,
+        use_storage_write_api: bool = False,
     ) -> None:
         """
         Load data from a CSV file into a BigQuery table.
@@ -170,10 +329,11 @@ class BigQueryLoader:
             write_disposition: What to do if table exists ('WRITE_TRUNCATE', 'WRITE_APPEND', 'WRITE_EMPTY')
             autodetect_schema: Whether to automatically detect the schema
             encoding: File encoding (default: utf-8)
-            batch_size: Number of rows to process in each batch
-            error_file: Path to save rows that failed to process
+            error_file: Path to save rows that failed to upload
             test_mode: If True, only process the first test_rows rows
             test_rows: Number of rows to process in test mode
+            use_storage_write_api: If True, stream rows through the Storage Write
+                API and only fall back to a load job if that fails
 
         Raises:
             FileNotFoundError: If CSV file doesn't exist
@@ -182,227 +342,182 @@ class BigQueryLoader:
         if not os.path.exists(csv_file_path):
             raise FileNotFoundError(f"CSV file not found: {csv_file_path}")
 
-        # Define schema
-        schema = [
-            bigquery.SchemaField("record_id", "STRING"),
-            bigquery.SchemaField("product_number", "STRING"),
-            bigquery.SchemaField("product_name", "STRING"),
-            bigquery.SchemaField("is_published", "STRING"),
-            bigquery.SchemaField("description", "STRING"),
-            bigquery.SchemaField("sale_start_date", "STRING"),
-            bigquery.SchemaField("sale_end_date", "STRING"),
-            bigquery.SchemaField("stock", "STRING"),
-            bigquery.SchemaField("sale_price", "STRING"),
-            bigquery.SchemaField("regular_price", "STRING"),
-            bigquery.SchemaField("category", "STRING"),
-            bigquery.SchemaField("brands", "STRING"),
-            bigquery.SchemaField("image_uri", "STRING"),
-            bigquery.SchemaField("custom_uri", "STRING"),
-            bigquery.SchemaField("is_product_variation", "STRING"),
-        ]
-
         # Configure the job
         job_config = bigquery.LoadJobConfig(
             write_disposition=write_disposition,
-            schema=schema,
-            source_format=bigquery.SourceFormat.CSV,
-            allow_quoted_newlines=True,  # Allow newlines in quoted fields
-            encoding="UTF-8",
+            schema=SCHEMA,
+            source_format=bigquery.SourceFormat.PARQUET,
         )
 
         # Construct full table ID
         full_table_id = f"{self.project_id}.{dataset_id}.{table_id}"
 
-        # Initialize error tracking
-        error_rows: List[Dict[str, Any]] = []
-        total_rows_processed = 0
-        successful_rows = 0
-
         try:
-            # Read the CSV file directly into a DataFrame
+            # Stream the CSV file through Arrow's parser block by block, keeping
+            # only the mapped columns and reading every value as a string. The
+            # header is cleaned and renamed up front and handed to the parser,
+            # so the parsed batches already carry the English column names.
             logger.info(f"Starting to process file: {csv_file_path}")
-            df = pd.read_csv(
-                csv_file_path,
-                dtype=str,
-                quoting=csv.QUOTE_ALL,  # Quote all fields
-                escapechar="\\",  # Use backslash as escape character
-                doublequote=True,  # Allow double quotes
+            bad_row_count = 0
+
+            def skip_invalid_row(row: pacsv.InvalidRow) -> str:
+                # Skip malformed rows instead of failing the whole read, and
+                # only log the first few so a broken file doesn't flood the log
+                nonlocal bad_row_count
+                bad_row_count += 1
+                if bad_row_count <= MAX_LOGGED_BAD_ROWS:
+                    logger.warning(
+                        f"Skipping malformed row: expected {row.expected_columns} columns, got {row.actual_columns}"
+                    )
+                return "skip"
+
+            column_names = _read_column_names(csv_file_path, encoding)
+            read_options = pacsv.ReadOptions(
+                block_size=CSV_BLOCK_SIZE,
                 encoding=encoding,
-                on_bad_lines="warn",  # Warn about bad lines instead of failing
-                lineterminator="\n",  # Explicitly set line terminator
+                column_names=column_names,
+                skip_rows=1,
+            )
+            parse_options = pacsv.ParseOptions(
+                newlines_in_values=True,  # Allow newlines in quoted fields
+                # Quotes inside fields may be written as \" instead of being
+                # doubled, which only the tokenizer can undo without breaking
+                # the field; doubled quotes are already the parser default
+                escape_char="\\",
+                invalid_row_handler=skip_invalid_row,
+            )
+            convert_options = pacsv.ConvertOptions(
+                column_types={col: pa.string() for col in COLUMN_MAPPING.values()},
+                include_columns=list(COLUMN_MAPPING.values()),
+                strings_can_be_null=True,
+            )
+            reader = pacsv.open_csv(
+                csv_file_path,
+                read_options=read_options,
+                parse_options=parse_options,
+                convert_options=convert_options,
             )
 
-            # Clean column names (remove any trailing whitespace or special characters)
-            df.columns = df.columns.str.strip().str.replace("\r", "")
-
-            # Log the initial shape and column names
-            logger.info(f"Initial DataFrame shape: {df.shape}")
-            logger.info(f"Initial columns: {df.columns.tolist()}")
-
-            # Map Thai column names to English
-            column_mapping = {
-                "ID": "record_id",
-                "รหัสสินค้า": "product_number",
-                "ชื่อ": "product_name",
-                "เผยแพร่แล้ว": "is_published",
-                "คำอธิบาย": "description",
-                "วันเริ่มต้นลดราคา": "sale_start_date",
-                "วันสิ้นสุดการลดราคา": "sale_end_date",
-                "คลังสินค้า": "stock",
-                "ราคาที่ลด": "sale_price",
-                "ราคาปกติ": "regular_price",
-                "หมวดหมู่": "category",
-                "Brands": "brands",
-                "ไฟล์รูปภาพ": "image_uri",
-                "Custom URI": "custom_uri",
-            }
-            # Verify all columns exist before renaming
-            missing_columns = [
-                col for col in column_mapping.keys() if col not in df.columns
-            ]
-            if missing_columns:
-                logger.error(f"Missing columns in CSV: {missing_columns}")
-                raise ValueError(f"Missing columns in CSV: {missing_columns}")
-
-            # Drop all columns that are not in column_mapping
-            columns_to_keep = list(column_mapping.keys())
-            df = df[columns_to_keep]
-            logger.info(f"Columns after filtering: {list(df.columns)}")
-
-            # Rename columns
-            df = df.rename(columns=column_mapping)
-
-            # Verify all expected columns exist after renaming
-            expected_columns = set(column_mapping.values())
-            actual_columns = set(df.columns)
-            if expected_columns != actual_columns:
-                logger.error(
-                    f"Column mismatch after renaming. Expected: {expected_columns}, Got: {actual_columns}"
-                )
-                raise ValueError("Column mismatch after renaming")
+            # Clean each batch as it is parsed
+            batches = [_clean_batch(batch) for batch in reader]
+            table = pa.Table.from_batches(batches, schema=reader.schema)
+            if bad_row_count:
+                logger.warning(f"Total malformed rows skipped: {bad_row_count}")
+            logger.info(f"Columns after filtering: {table.column_names}")
 
             # Log the shape after renaming
-            logger.info(f"DataFrame shape after renaming: {df.shape}")
+            logger.info(
+                f"Table shape after renaming: ({table.num_rows}, {table.num_columns})"
+            )
 
             # Data quality checks
             logger.info("\nPerforming data quality checks...")
 
-            # Trim record_ids and add is_product_variation column
-            logger.info("Processing record_ids and adding variation flag...")
-            df["record_id"] = df["record_id"].str.strip()
-
             # Check for empty record_ids
-            empty_ids = df["record_id"].isna().sum()
+            empty_ids = table["record_id"].null_count
             logger.info(f"Number of empty record_ids: {empty_ids}")
 
             # Check for duplicates
-            duplicates = df["record_id"].duplicated().sum()
+            duplicates = table.num_rows - pc.count_distinct(
+                table["record_id"], mode="all"
+            ).as_py()
             if duplicates > 0:
                 logger.warning(
                     f"Found {duplicates} duplicate record_ids. Keeping the latest version."
                 )
-                duplicate_ids = df[df["record_id"].duplicated(keep=False)][
-                    "record_id"
-                ].unique()
-                logger.warning(f"First few duplicate record_ids: {duplicate_ids[:5]}")
+                id_counts = pc.value_counts(table["record_id"])
+                duplicate_ids = id_counts.field("values").filter(
+                    pc.greater(id_counts.field("counts"), 1)
+                )
+                logger.warning(
+                    f"First few duplicate record_ids: {duplicate_ids[:5].to_pylist()}"
+                )
 
                 # Show example of duplicates
-                for dup_id in duplicate_ids[:3]:
-                    dup_rows = df[df["record_id"] == dup_id]
+                for dup_id in duplicate_ids[:3].to_pylist():
+                    dup_rows = table.filter(pc.equal(table["record_id"], dup_id))
                     logger.warning(f"\nDuplicate records for ID {dup_id}:")
-                    for _, row in dup_rows.iterrows():
-                        logger.warning(f"  - Product: {row['product_name'][:50]}...")
-
-            # Remove duplicates, keeping the last occurrence
-            df = df.drop_duplicates(subset=["record_id"], keep="last")
-            logger.info(f"DataFrame shape after removing duplicates: {df.shape}")
+                    for product_name in dup_rows["product_name"].to_pylist():
+                        logger.warning(f"  - Product: {(product_name or '')[:50]}...")
+
+            # Remove duplicates, keeping the last occurrence in file order
+            last_rows = (
+                table.select(["record_id"])
+                .append_column("row_index", pa.array(np.arange(table.num_rows)))
+                .group_by("record_id", use_threads=False)
+                .aggregate([("row_index", "max")])
+            )
+            table = table.take(np.sort(last_rows["row_index_max"].to_numpy()))
+            logger.info(
+                f"Table shape after removing duplicates: ({table.num_rows}, {table.num_columns})"
+            )
 
             # Check unique record_ids
-            unique_ids = df["record_id"].nunique()
+            unique_ids = pc.count_distinct(table["record_id"]).as_py()
             logger.info(f"Number of unique record_ids: {unique_ids}")
 
-            # Get record_id statistics
-            id_stats = df["record_id"].describe()
-            logger.info(f"\nRecord ID statistics:\n{id_stats}")
-
             # Analyze product numbers
             logger.info("\nAnalyzing product numbers...")
             # Check for empty product numbers
-            empty_product_numbers = df["product_number"].isna().sum()
+            empty_product_numbers = table["product_number"].null_count
             logger.info(f"Number of empty product numbers: {empty_product_numbers}")
 
             # Check for duplicate product numbers
-            duplicate_products = df["product_number"].duplicated().sum()
+            duplicate_products = table.num_rows - pc.count_distinct(
+                table["product_number"], mode="all"
+            ).as_py()
             logger.info(f"Number of duplicate product numbers: {duplicate_products}")
 
             if duplicate_products > 0:
-                duplicate_product_examples = (
-                    df[df["product_number"].duplicated(keep=False)]
-                    .groupby("product_number")
-                    .size()
+                product_counts = pc.value_counts(table["product_number"])
+                duplicate_product_examples = product_counts.filter(
+                    pc.greater(product_counts.field("counts"), 1)
                 )
                 logger.info(
-                    f"Product numbers with duplicates (first 5):\n{duplicate_product_examples.head()}"
+                    f"Product numbers with duplicates (first 5): {duplicate_product_examples[:5].to_pylist()}"
                 )
 
             # Compare record_ids with product numbers
             logger.info("\nComparing record_ids with product numbers...")
-            product_number_to_record_ids = df.groupby("product_number")[
-                "record_id"
-            ].nunique()
-            multiple_record_ids = product_number_to_record_ids[
-                product_number_to_record_ids > 1
-            ]
+            product_number_to_record_ids = table.group_by("product_number").aggregate(
+                [("record_id", "count_distinct")]
+            )
+            multiple_record_ids = product_number_to_record_ids.filter(
+                pc.and_(
+                    pc.is_valid(product_number_to_record_ids["product_number"]),
+                    pc.greater(
+                        product_number_to_record_ids["record_id_count_distinct"], 1
+                    ),
+                )
+            )
             logger.info(
-                f"Number of product numbers with multiple record_ids: {len(multiple_record_ids)}"
+                f"Number of product numbers with multiple record_ids: {multiple_record_ids.num_rows}"
             )
-            if len(multiple_record_ids) > 0:
+            if multiple_record_ids.num_rows > 0:
                 logger.info(
-                    f"First few product numbers with multiple record_ids:\n{multiple_record_ids.head()}"
+                    f"First few product numbers with multiple record_ids: {multiple_record_ids.slice(0, 5).to_pylist()}"
                 )
 
             # Drop rows with empty record_id
-            df = df.dropna(subset=["record_id"])
-            logger.info(f"DataFrame shape after dropping empty record_id: {df.shape}")
-
-            # Clean the data
-            for col in df.columns:
-                if col != "is_product_variation":  # Skip the new column
-                    if col == "stock":
-                        df[col] = df[col].fillna("0")
-                    else:
-                        df[col] = df[col].fillna("")  # Replace NaN with empty string
-                    df[col] = df[col].astype(str)  # Convert all columns to string
-
-                    # Special handling for description column
-                    if col == "description":
-
-                        def clean_description(text):
-                            # First, normalize all newlines to \n
-                            text = text.replace("\r\n", "\n").replace("\r", "\n")
-
-                            # Handle the case where \n is written as literal characters
-                            text = text.replace(
-                                "\\\\n", "<br/>"
-                            )  # Handle escaped backslash
-                            text = text.replace("\\n", "<br/>")  # Handle regular \n
-
-                            # Replace any remaining actual newlines with <br/>
-                            text = text.replace("\n", "<br/>")
-
-                            # Clean up any remaining 'n' characters that might appear after <br/>
-                            text = text.replace("<br/>n", "<br/>")
-
-                            return text
-
-                        df[col] = df[col].apply(clean_description)
-                    else:
-                        # For other columns, just clean up newlines
-                        df[col] = df[col].apply(
-                            lambda x: x.replace("\r\n", " ")
-                            .replace("\n", " ")
-                            .replace("\r", " ")
-                        )
+            table = table.filter(pc.is_valid(table["record_id"]))
+            logger.info(
+                f"Table shape after dropping empty record_id: ({table.num_rows}, {table.num_columns})"
+            )
+
+            # If in test mode, limit the data. Slicing the Arrow table is
+            # zero-copy, so only the kept rows are filled and converted below.
+            if test_mode:
+                table = table.slice(0, test_rows)
+                logger.info(f"Test mode: Processing first {test_rows} rows")
+
+            # Replace nulls with empty strings ("0" for stock)
+            table = pa.table(
+                {
+                    col: pc.fill_null(table[col], "0" if col == "stock" else "")
+                    for col in table.column_names
+                }
+            )
+            df = table.to_pandas()
 
             # Log sample of first row
             logger.info("\nSample of first row:")
@@ -412,133 +527,114 @@ class BigQueryLoader:
                     f"{key}: {value[:100]}..."
                 )  # Show first 100 chars of each field
 
-            # If in test mode, limit the data
-            if test_mode:
-                df = df.head(test_rows)
-                logger.info(f"Test mode: Processing first {test_rows} rows")
-
             logger.info("Populate main products stock and regular_price...")
 
-            # some product number contain "+"
-            df["product_number"] = df["product_number"].apply(
-                lambda x: x.replace("+", "-")
-            )
-            # some product number contain " "
-            df["product_number"] = df["product_number"].apply(
-                lambda x: x.replace(" ", "-")
+            # add product_variation
+            df["is_product_variation"] = np.where(
+                df["product_number"].str.contains("-", regex=False), "1", "0"
             )
-            # some product number contain " "
-            df["product_number"] = df["product_number"].apply(
-                lambda x: x.replace("*", "-")
+            main_product_numbers = df.loc[
+                (df["is_product_variation"] == "0") & (df["product_number"] != ""),
+                "product_number",
+            ].unique()
+            # Roll variation stock and regular_price up to their main product
+            # in a single groupby over the main product number
+            df["main_number"] = df["product_number"].str.split("-", n=1).str[0]
+            subproduct_df = df[df["product_number"] != df["main_number"]]
+            # Parse stock once so the groupby can sum it natively
+            subproduct_df = subproduct_df.assign(
+                stock_int=pd.to_numeric(subproduct_df["stock"], errors="coerce")
+                .fillna(0)
+                .astype("int64")
             )
-            # add product_variation
-            df["is_product_variation"] = (
-                df["product_number"].str.contains("-").map({True: "1", False: "0"})
+            rollup = subproduct_df.groupby("main_number", sort=False).agg(
+                stock_sum=("stock_int", "sum"),
+                last_regular_price=("regular_price", "last"),
             )
-            main_product_numbers = set(
-                [num for num in df["product_number"] if "-" not in num and num != ""]
+            mask = df["product_number"].isin(main_product_numbers) & df[
+                "product_number"
+            ].isin(rollup.index)
+            main_rows = df.loc[mask, "product_number"]
+            df.loc[mask, "stock"] = (
+                main_rows.map(rollup["stock_sum"]).astype(str).values
             )
-            for main_number in tqdm(main_product_numbers):
-                subproduct_df = df[
-                    df["product_number"].apply(
-                        lambda x: x.startswith(f"{main_number}-")
-                    )
-                ]
-                if len(subproduct_df) > 0:
-                    stock_sum = str(subproduct_df["stock"].astype(int).sum().item())
-                    regular_price = list(subproduct_df["regular_price"])[-1]
-                    df.loc[df["product_number"] == main_number, ["stock"]] = stock_sum
-                    df.loc[df["product_number"] == main_number, ["regular_price"]] = (
-                        regular_price
-                    )
-
-            # Process data in batches
-            for i in range(0, len(df), batch_size):
-                batch_df = df.iloc[i : i + batch_size].copy()
-                batch_num = (i // batch_size) + 1
-                total_batches = (len(df) + batch_size - 1) // batch_size
-
-                # Use WRITE_TRUNCATE for the first batch, WRITE_APPEND for the rest
-                if batch_num == 1:
-                    batch_write_disposition = write_disposition
-                else:
-                    batch_write_disposition = "WRITE_APPEND"
-                batch_job_config = bigquery.LoadJobConfig(
-                    write_disposition=batch_write_disposition,
-                    schema=schema,
-                    source_format=bigquery.SourceFormat.CSV,
-                    allow_quoted_newlines=True,
-                    encoding="UTF-8",
-                )
-
+            df.loc[mask, "regular_price"] = main_rows.map(
+                rollup["last_regular_price"]
+            ).values
+            df = df.drop(columns=["main_number"])
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            error_rows: List[Dict[str, Any]] = []
+            streamed = False
+            if use_storage_write_api:
+                logger.info(f"\nStreaming {table.num_rows} rows to {full_table_id}")
                 try:
-                    # Log batch information
-                    logger.info(f"\nProcessing batch {batch_num}/{total_batches}")
-                    logger.info(f"Batch size: {len(batch_df)} rows")
-                    logger.info(
-                        f"First record_id in batch: {batch_df['record_id'].iloc[0]}"
+                    self._append_rows(
+                        table.replace_schema_metadata(),
+                        dataset_id,
+                        table_id,
+                        write_disposition,
                     )
-
-                    # Try to upload the entire batch at once
-                    job = self.client.load_table_from_dataframe(
-                        batch_df, full_table_id, job_config=batch_job_config
-                    )
-                    job.result()
-                    logger.info(
-                        f"Batch {batch_num}/{total_batches} uploaded successfully"
-                    )
-                    successful_rows += len(batch_df)
+                    streamed = True
                 except Exception as e:
                     logger.error(
-                        f"Error uploading batch {batch_num}/{total_batches}: {str(e)}"
+                        f"Storage Write API upload failed, falling back to a load job: {str(e)}"
                     )
-                    # If batch upload fails and we're in test mode, terminate
-                    if test_mode:
-                        raise Exception(
-                            "Test mode: Error encountered, terminating process"
-                        )
 
-                    # If not in test mode, try row by row
-                    for idx, row in tqdm(
-                        batch_df.iterrows(),
-                        total=len(batch_df),
-                        desc=f"Processing batch {batch_num}/{total_batches} row by row",
-                        unit="rows",
-                    ):
+            if not streamed:
+                # Write the cleaned data to a single Parquet file and upload it
+                # with one load job
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    parquet_file = os.path.join(tmp_dir, "products.parquet")
+                    pq.write_table(table, parquet_file, compression="snappy")
+                    logger.info(f"\nUploading {table.num_rows} rows to {full_table_id}")
+
+                    try:
+                        self._upload_file(parquet_file, full_table_id, job_config)
+                    except Exception as e:
+                        logger.error(f"Error uploading to {full_table_id}: {str(e)}")
+                        # If upload fails and we're in test mode, terminate
+                        if test_mode:
+                            raise Exception(
+                                "Test mode: Error encountered, terminating process"
+                            )
+
+                        # If not in test mode, retry once as newline-delimited JSON
+                        # so BigQuery skips and reports bad rows instead of failing
+                        # the whole load (max_bad_records is not supported for Parquet)
+                        logger.info("Retrying upload with bad rows skipped...")
+                        json_file = os.path.join(tmp_dir, "products.json")
+                        df.to_json(
+                            json_file, orient="records", lines=True, force_ascii=False
+                        )
+                        retry_config = bigquery.LoadJobConfig(
+                            write_disposition=write_disposition,
+                            schema=SCHEMA,
+                            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                            max_bad_records=len(df),
+                        )
                         try:
-                            row_df = pd.DataFrame([row])
-                            if self._process_batch(
-                                row_df,
-                                full_table_id,
-                                batch_job_config,
-                                batch_num,
-                                total_batches,
-                            ):
-                                successful_rows += 1
-                            else:
-                                error_rows.append(
-                                    {
-                                        "row_index": idx + i,
-                                        "batch_number": batch_num,
-                                        "error_timestamp": datetime.now().isoformat(),
-                                        "row_data": row.to_dict(),
-                                    }
-                                )
-                        except Exception as e:
-                            logger.error(
-                                f"Error processing row {idx + i} in batch {batch_num}: {str(e)}"
+                            job = self._upload_file(
+                                json_file, full_table_id, retry_config
+                            )
+                        except Exception:
+                            df.to_csv(error_file, index=False)
+                            logger.warning(
+                                f"Saved {len(df)} error rows to {error_file}"
                             )
+                            raise
+
+                        error_timestamp = datetime.now().isoformat()
+                        for error in job.errors or []:
                             error_rows.append(
                                 {
-                                    "row_index": idx + i,
-                                    "batch_number": batch_num,
-                                    "error_timestamp": datetime.now().isoformat(),
-                                    "row_data": row.to_dict(),
+                                    "error_timestamp": error_timestamp,
+                                    "reason": error.get("reason"),
+                                    "location": error.get("location"),
+                                    "message": error.get("message"),
                                 }
                             )
 
-                total_rows_processed += len(batch_df)
-
             # Save error rows to CSV if any errors occurred
             if error_rows:
                 error_df = pd.DataFrame(error_rows)
@@ -549,8 +645,8 @@ class BigQueryLoader:
             logger.info(
                 f"""
             Upload Summary:
-            - Total rows processed: {total_rows_processed}
-            - Successful rows: {successful_rows}
+            - Total rows processed: {table.num_rows}
+            - Successful rows: {table.num_rows - len(error_rows)}
             - Failed rows: {len(error_rows)}
             - Error log file: {error_file}
             """
@@ -576,9 +672,9 @@ def bq_upload_ops(file_name):
                 csv_file_path=file_name,
                 dataset_id=DATASET_ID,
                 table_id=RAW_TABLE_ID,
-                batch_size=BATCH_SIZE,
                 test_mode=True,
                 test_rows=100,
+                use_storage_write_api=USE_STORAGE_WRITE_API,
             )
 
             # If test run successful, proceed with full load
@@ -587,8 +683,8 @@ def bq_upload_ops(file_name):
                 csv_file_path=file_name,
                 dataset_id=DATASET_ID,
                 table_id=RAW_TABLE_ID,
-                batch_size=BATCH_SIZE,
                 test_mode=False,
+                use_storage_write_api=USE_STORAGE_WRITE_API,
             )
 
             # After loading raw data, create filtered table
@@ -646,8 +742,11 @@ def bq_upload_ops(file_name):
             raw_count_query = f"SELECT COUNT(*) as count FROM `{PROJECT_ID}.{DATASET_ID}.{RAW_TABLE_ID}`"
             filtered_count_query = f"SELECT COUNT(*) as count FROM `{PROJECT_ID}.{DATASET_ID}.{FILTERED_TABLE_ID}`"
 
-            raw_count = next(client.query(raw_count_query).result()).count
-            filtered_count = next(client.query(filtered_count_query).result()).count
+            # Submit both queries before waiting so they run concurrently
+            raw_count_job = client.query(raw_count_query)
+            filtered_count_job = client.query(filtered_count_query)
+            raw_count = next(raw_count_job.result()).count
+            filtered_count = next(filtered_count_job.result()).count
 
             logger.info(
                 f"""
@@ -4,11 +4,25 @@ from pydrive2.drive import GoogleDrive
 from datetime import datetime, timedelta
 import os
 import logging
+import logging.handlers
 
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# basicConfig only formats the handlers it is given, so the file handler
+# wrapped by the MemoryHandler needs its own formatter
+log_file_handler = logging.FileHandler("bq_loader.log")
+log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("bq_loader.log"), logging.StreamHandler()],
+    format=LOG_FORMAT,
+    handlers=[
+        # buffer file writes so bursts of warnings are flushed together
+        logging.handlers.MemoryHandler(
+            capacity=1024,
+            flushLevel=logging.ERROR,
+            target=log_file_handler,
+        ),
+        logging.StreamHandler(),
+    ],
 )
 logger = logging.getLogger(__name__)
 
@@ -2,12 +2,26 @@ from drive_csv_loader import drive_mount_ops
 from bq_load import bq_upload_ops
 from update_datastore import update_datastore_ops
 import logging
+import logging.handlers
 import asyncio
 
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# basicConfig only formats the handlers it is given, so the file handler
+# wrapped by the MemoryHandler needs its own formatter
+log_file_handler = logging.FileHandler("bq_loader.log")
+log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("bq_loader.log"), logging.StreamHandler()],
+    format=LOG_FORMAT,
+    handlers=[
+        # buffer file writes so bursts of warnings are flushed together
+        logging.handlers.MemoryHandler(
+            capacity=1024,
+            flushLevel=logging.ERROR,
+            target=log_file_handler,
+        ),
+        logging.StreamHandler(),
+    ],
 )
 logger = logging.getLogger(__name__)
 
@@ -43,4 +57,8 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        # Flush INFO lines still buffered in the MemoryHandler
+        logging.shutdown()
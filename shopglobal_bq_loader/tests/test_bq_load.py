@@ -0,0 +1,44 @@
+"""Tests for CSV header handling. Run with `python -m pytest tests` from shopglobal_bq_loader."""
+import csv
+
+import pyarrow.csv as pacsv
+import pytest
+
+from bq_load import COLUMN_MAPPING, _read_column_names
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    def write(encoding):
+        path = tmp_path / "products.csv"
+        with open(path, "w", encoding=encoding, newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMN_MAPPING.keys())
+            writer.writerow(f"value {i}" for i in range(len(COLUMN_MAPPING)))
+        return str(path)
+
+    return write
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig"])
+def test_reads_header_with_and_without_bom(write_csv, encoding):
+    path = write_csv(encoding)
+    assert _read_column_names(path, "utf-8") == list(COLUMN_MAPPING.values())
+
+
+def test_bom_header_rows_parse_under_mapped_names(write_csv):
+    path = write_csv("utf-8-sig")
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(
+            column_names=_read_column_names(path, "utf-8"), skip_rows=1
+        ),
+    )
+    assert table.column("record_id").to_pylist() == ["value 0"]
+
+
+def test_missing_column_raises(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text("\ufeffชื่อ\nx\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Missing columns"):
+        _read_column_names(str(path), "utf-8")
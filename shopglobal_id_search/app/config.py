@@ -9,6 +9,7 @@ APP_HOST = os.getenv("HOST", "0.0.0.0")
 APP_PORT = os.getenv("PORT", "8080")
 APP_AUTO_RELOAD = os.getenv("AUTO_RELOAD", "False")
 APP_LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+APP_WORKERS = os.getenv("WORKERS", "1")
 GOOGLE_CREDENTIAL = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 # Google Cloud Configuration
 GOOGLE_PROJECT_ID = os.getenv("GOOGLE_PROJECT_ID_PROD", "prd-search-shg-api")
@@ -26,3 +27,7 @@ CORS_ALLOW_ORIGINS = os.getenv("CORS_ALLOW_ORIGINS", "*")
 # Query Configuration
 MIN_ID_LENGTH = int(os.getenv("MIN_ID_LENGTH", "1"))
 MAX_ID_LENGTH = int(os.getenv("MAX_ID_LENGTH", "10"))
+PRODUCT_INDEX_REFRESH_SECONDS = int(os.getenv("PRODUCT_INDEX_REFRESH_SECONDS", "3600"))
+LOOKUP_CACHE_TTL_SECONDS = int(os.getenv("LOOKUP_CACHE_TTL_SECONDS", "300"))
+LOOKUP_CACHE_MAX_SIZE = int(os.getenv("LOOKUP_CACHE_MAX_SIZE", "10000"))
+BQ_MAX_CONCURRENCY = int(os.getenv("BQ_MAX_CONCURRENCY", "5"))
@@ -1,18 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+import asyncio
 import logging
 import uvicorn
+from google.cloud import bigquery
+from google.cloud import bigquery_storage
+from google.cloud.bigquery_storage_v1.services.big_query_read.transports import (
+    BigQueryReadGrpcTransport,
+)
 from app.config import (
     CORS_ALLOW_ORIGINS,
+    GOOGLE_PROJECT_ID,
     MIN_ID_LENGTH,
     MAX_ID_LENGTH,
+    PRODUCT_INDEX_REFRESH_SECONDS,
     APP_HOST,
     APP_PORT,
     APP_AUTO_RELOAD,
     APP_LOG_LEVEL,
+    APP_WORKERS,
 )
 from app.authentications import validate_api_key, get_gcp_credentials
-from app.utils import search_product_by_id
+from app.utils import (
+    search_product_by_id,
+    load_product_index,
+    refresh_product_index,
+)
 from app.data_store import HealthCheckResponse, ProductResponse, ErrorResponse
 
 # Configure logging
@@ -25,10 +40,27 @@ logger = logging.getLogger(__name__)
 ########################################################
 # FastAPI Setup
 ########################################################
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the product index before serving and keep it fresh in the background"""
+    try:
+        await load_product_index(bq_read_client)
+    except Exception as e:
+        # Lookups fall back to BigQuery until the next refresh succeeds
+        logger.error("Failed to load product index: %s", e)
+    refresh_task = asyncio.create_task(
+        refresh_product_index(bq_read_client, PRODUCT_INDEX_REFRESH_SECONDS)
+    )
+    yield
+    refresh_task.cancel()
+
+
 app = FastAPI(
     title="ShopChannel Search-by-ID API",
     description="API for searching individual products by product_number from BigQuery. Returns exact matches for product lookup.",
     version="0.0.1",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS Configuration
@@ -45,9 +77,35 @@ app.add_middleware(
 try:
     credentials = get_gcp_credentials()
 except Exception as e:
-    logger.error(f"Failed to initialize GCP credentials: {str(e)}")
+    logger.error("Failed to initialize GCP credentials: %s", e)
     raise HTTPException(status_code=500, detail="Failed to initialize GCP credentials")
 
+# Initialize a single BigQuery client so connections are reused across requests.
+# Optional job creation lets short lookups return without materializing a job.
+bq_client = bigquery.Client(
+    credentials=credentials,
+    project=GOOGLE_PROJECT_ID,
+    default_job_creation_mode="JOB_CREATION_OPTIONAL",
+)
+# Storage Read API client for bulk-loading the product index. The index is
+# refreshed only every PRODUCT_INDEX_REFRESH_SECONDS, so keepalive pings hold
+# the gRPC channel open across the idle period instead of reconnecting.
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+bq_read_channel = BigQueryReadGrpcTransport.create_channel(
+    credentials=credentials,
+    options=GRPC_CHANNEL_OPTIONS,
+)
+bq_read_client = bigquery_storage.BigQueryReadClient(
+    transport=BigQueryReadGrpcTransport(channel=bq_read_channel)
+)
+
 
 ########################################################
 # API Endpoints
@@ -153,7 +211,7 @@ async def search_by_id(
     ```
     """
     try:
-        product_data = await search_product_by_id(id, credentials)
+        product_data = await search_product_by_id(id, bq_client)
 
         if product_data:
             return ProductResponse(**product_data)
@@ -171,10 +229,15 @@ async def search_by_id(
 
 if __name__ == "__main__":
     # Run the FastAPI application using uvicorn
+    reload = APP_AUTO_RELOAD.lower() == "true"
     uvicorn.run(
         "app.main:app",
         host=APP_HOST,
         port=int(APP_PORT),
-        reload=bool(APP_AUTO_RELOAD),  # Enable auto-reload during development
+        reload=reload,  # Enable auto-reload during development
         log_level=APP_LOG_LEVEL,
+        # The reloader runs a single process, so workers only apply without it
+        workers=1 if reload else int(APP_WORKERS),
+        loop="uvloop",
+        http="httptools",
     )
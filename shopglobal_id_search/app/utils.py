@@ -1,28 +1,71 @@
+import asyncio
 import logging
 import re
 from typing import Optional, Dict, Any
+from cachetools import TTLCache
 from fastapi import HTTPException
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 
 from app.config import (
     GOOGLE_PROJECT_ID,
     GOOGLE_DATASET_ID,
     GOOGLE_TABLE_ID,
     MIN_ID_LENGTH,
-    MAX_ID_LENGTH
+    MAX_ID_LENGTH,
+    LOOKUP_CACHE_TTL_SECONDS,
+    LOOKUP_CACHE_MAX_SIZE,
+    BQ_MAX_CONCURRENCY,
 )
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# In-memory copy of the products table keyed by product_number, rebuilt on a
+# schedule so most lookups never reach BigQuery
+PRODUCT_INDEX: Dict[str, Dict[str, Any]] = {}
+
+# Short-lived cache of BigQuery fallback lookups (including misses), cleared
+# whenever the index is rebuilt
+LOOKUP_CACHE: TTLCache = TTLCache(maxsize=LOOKUP_CACHE_MAX_SIZE, ttl=LOOKUP_CACHE_TTL_SECONDS)
+_NOT_CACHED = object()
+
+# Caps in-flight BigQuery fallback queries so bursts of cache misses queue here
+# instead of contending for the client's connection pool
+_BQ_SEMAPHORE = asyncio.Semaphore(BQ_MAX_CONCURRENCY)
+
+# Product queries; the table never changes at runtime, so these are built once
+_TABLE_REF = f"{GOOGLE_PROJECT_ID}.{GOOGLE_DATASET_ID}.{GOOGLE_TABLE_ID}"
+_TABLE_PATH = f"projects/{GOOGLE_PROJECT_ID}/datasets/{GOOGLE_DATASET_ID}/tables/{GOOGLE_TABLE_ID}"
+_PRODUCT_FIELDS = [
+    "record_id",
+    "product_number",
+    "product_name",
+    "description",
+    "sale_price",
+    "regular_price",
+    "category",
+    "brands",
+    "image_uri",
+    "custom_uri",
+    "is_available",
+]
+_PRODUCT_COLUMNS = ",\n    ".join(_PRODUCT_FIELDS)
+_SEARCH_SQL = f"""
+    SELECT {_PRODUCT_COLUMNS}
+    FROM `{_TABLE_REF}`
+    WHERE product_number = @product_number
+    LIMIT 1
+"""
+
+# Characters outside alphanumerics and the safe "-", "_" and "*"
+_ID_SANITIZE_RE = re.compile(r"[^\w\-_*]")
+
 
 def sanitize_id(product_number: str) -> str:
     """Sanitize product number to prevent injection attacks"""
     try:
         # Remove any dangerous characters, keep only alphanumeric and safe characters including *
-        product_number = re.sub(r"[^\w\-_*]", "", product_number)
+        product_number = _ID_SANITIZE_RE.sub("", product_number)
         sanitized = product_number.strip()
         
         if not sanitized:
@@ -33,17 +76,102 @@ def sanitize_id(product_number: str) -> str:
             
         return sanitized
     except Exception as e:
-        logger.error(f"ID sanitization failed: {str(e)}")
+        logger.error("ID sanitization failed: %s", e)
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
 
-async def search_product_by_id(product_number: str, credentials) -> Optional[Dict[str, Any]]:
+def _row_to_product(row) -> Dict[str, Any]:
+    """Map a products row (BigQuery Row or dict) to the API product fields"""
+    return {
+        "id": row["record_id"] or "",
+        "record_id": row["record_id"] or "",
+        "product_number": row["product_number"] or "",
+        "product_name": row["product_name"] or "",
+        "image_uri": row["image_uri"] or "",
+        "description": row["description"] or "",
+        "product_uri": row["custom_uri"] or "",
+        "category": row["category"] or "",
+        "brands": row["brands"] or "",
+        "regular_price": row["regular_price"] or "",
+        "sale_price": row["sale_price"] or "",
+        "is_available": bool(row["is_available"]) if row["is_available"] is not None else False,
+    }
+
+
+def read_product_index(read_client: bigquery_storage.BigQueryReadClient) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the whole products table through the BigQuery Storage Read API, which
+    streams the table as Arrow without running a query
+    
+    Args:
+        read_client: Shared BigQuery Storage read client
+        
+    Returns:
+        New product index keyed by product_number
+    """
+    requested_session = bigquery_storage.types.ReadSession(
+        table=_TABLE_PATH,
+        data_format=bigquery_storage.types.DataFormat.ARROW,
+        read_options=bigquery_storage.types.ReadSession.TableReadOptions(
+            selected_fields=_PRODUCT_FIELDS,
+            row_restriction="product_number IS NOT NULL",
+        ),
+    )
+    session = read_client.create_read_session(
+        parent=f"projects/{GOOGLE_PROJECT_ID}",
+        read_session=requested_session,
+        max_stream_count=1,
+    )
+    rows = []
+    if session.streams:
+        reader = read_client.read_rows(session.streams[0].name)
+        rows = reader.to_arrow(session).to_pylist()
+
+    return {row["product_number"]: _row_to_product(row) for row in rows}
+
+
+async def load_product_index(read_client: bigquery_storage.BigQueryReadClient) -> int:
     """
-    Search for a product by product_number in BigQuery
+    Rebuild PRODUCT_INDEX from BigQuery and clear LOOKUP_CACHE
+    
+    The blocking read runs in a worker thread, while the swap and the cache
+    clear happen back on the event loop, since TTLCache is not thread-safe
+    
+    Args:
+        read_client: Shared BigQuery Storage read client
+        
+    Returns:
+        Number of products in the new index
+    """
+    global PRODUCT_INDEX
+
+    # Build the new index aside and swap it in, so lookups never see a partial index
+    PRODUCT_INDEX = await asyncio.to_thread(read_product_index, read_client)
+    LOOKUP_CACHE.clear()
+    logger.info("Loaded %d products into the in-memory index", len(PRODUCT_INDEX))
+    return len(PRODUCT_INDEX)
+
+
+async def refresh_product_index(
+    read_client: bigquery_storage.BigQueryReadClient, interval_seconds: int
+) -> None:
+    """Reload PRODUCT_INDEX every interval_seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await load_product_index(read_client)
+        except Exception as e:
+            logger.error("Product index refresh failed: %s", e)
+
+
+async def search_product_by_id(product_number: str, client: bigquery.Client) -> Optional[Dict[str, Any]]:
+    """
+    Search for a product by product_number in the in-memory index, falling back
+    to BigQuery for products added since the last index refresh
     
     Args:
         product_number: The product number to search for (e.g., "121552*006")
-        credentials: GCP credentials for BigQuery access
+        client: Shared BigQuery client
         
     Returns:
         Dict containing product data if found, None if not found
@@ -55,35 +183,17 @@ async def search_product_by_id(product_number: str, credentials) -> Optional[Dic
         # Sanitize the ID
         sanitized_id = sanitize_id(product_number)
         
-        logger.info(f"Searching for product with product_number: {sanitized_id}")
-        
-        # Initialize BigQuery client
-        client = bigquery.Client(credentials=credentials, project=GOOGLE_PROJECT_ID)
-        
-        # Construct the query
-        table_ref = f"{GOOGLE_PROJECT_ID}.{GOOGLE_DATASET_ID}.{GOOGLE_TABLE_ID}"
-        query = f"""
-            SELECT 
-                record_id,
-                product_number,
-                product_name,
-                is_published,
-                description,
-                sale_start_date,
-                sale_end_date,
-                stock,
-                sale_price,
-                regular_price,
-                category,
-                brands,
-                image_uri,
-                custom_uri,
-                is_product_variation,
-                is_available
-            FROM `{table_ref}`
-            WHERE product_number = @product_number
-            LIMIT 1
-        """
+        logger.info("Searching for product with product_number: %s", sanitized_id)
+
+        product_data = PRODUCT_INDEX.get(sanitized_id)
+        if product_data:
+            logger.info("Found product in index: %s", product_data["product_name"])
+            return product_data
+
+        cached = LOOKUP_CACHE.get(sanitized_id, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            logger.info("Served product_number %s from lookup cache", sanitized_id)
+            return cached
         
         # Configure query parameters
         job_config = bigquery.QueryJobConfig(
@@ -92,34 +202,26 @@ async def search_product_by_id(product_number: str, credentials) -> Optional[Dic
             ]
         )
         
-        # Execute the query
-        query_job = client.query(query, job_config=job_config)
-        results = query_job.result()
+        # Execute the query through jobs.query so rows come back in the first response.
+        # The client call blocks, so it runs in a worker thread under the semaphore.
+        async with _BQ_SEMAPHORE:
+            results = await asyncio.to_thread(
+                client.query_and_wait, _SEARCH_SQL, job_config=job_config, wait_timeout=10
+            )
         
         # Process the result
         for row in results:
-            product_data = {
-                "id": row.record_id or "",
-                "record_id": row.record_id or "",
-                "product_number": row.product_number or "",
-                "product_name": row.product_name or "",
-                "image_uri": row.image_uri or "",
-                "description": row.description or "",
-                "product_uri": row.custom_uri or "",
-                "category": row.category or "",
-                "brands": row.brands or "",
-                "regular_price": row.regular_price or "",
-                "sale_price": row.sale_price or "",
-                "is_available": bool(row.is_available) if row.is_available is not None else False,
-            }
+            product_data = _row_to_product(row)
             
-            logger.info(f"Found product: {product_data['product_name']}")
+            logger.info("Found product: %s", product_data["product_name"])
+            LOOKUP_CACHE[sanitized_id] = product_data
             return product_data
         
         # No results found
-        logger.info(f"No product found with product_number: {sanitized_id}")
+        logger.info("No product found with product_number: %s", sanitized_id)
+        LOOKUP_CACHE[sanitized_id] = None
         return None
         
     except Exception as e:
-        logger.error(f"Search by ID failed: {str(e)}")
+        logger.error("Search by ID failed: %s", e)
         raise HTTPException(status_code=500, detail="Search operation failed") 
\ No newline at end of file
@@ -3,12 +3,10 @@ from fastapi import Depends, HTTPException
 import os
 import json
 import logging
+from functools import lru_cache
 from app.config import API_KEY, GCP_CREDENTIALS_FILE, GOOGLE_CREDENTIAL
 from google.oauth2 import service_account
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
@@ -31,20 +29,36 @@ def validate_api_key(api_key: str = Depends(api_key_header)) -> str:
 ########################################################
 # GCP Setup
 ########################################################
+def _parse_credential_info():
+    """Parse the service account JSON from the environment, if set."""
+    if not GOOGLE_CREDENTIAL:
+        return None
+    try:
+        return json.loads(GOOGLE_CREDENTIAL)
+    except json.JSONDecodeError as e:
+        logger.warning("Failed to parse GCP credentials from environment: %s", e)
+        return None
+
+
+# Parsed once at import rather than on every credentials lookup
+_CRED_INFO = _parse_credential_info()
+
+
+@lru_cache(maxsize=1)
 def get_gcp_credentials():
-    """Initialize and return GCP credentials."""
+    """Initialize and return GCP credentials, cached for the process."""
     try:
         # First: try to get credentials from environment
-        if GOOGLE_CREDENTIAL:
+        if _CRED_INFO:
             try:
                 credentials = service_account.Credentials.from_service_account_info(
-                    info=json.loads(GOOGLE_CREDENTIAL),
+                    info=_CRED_INFO,
                     scopes=["https://www.googleapis.com/auth/cloud-platform"],
                 )
                 if credentials.valid:
                     logger.info("Using GCP credentials from environment")
                     return credentials
-            except (ValueError, json.JSONDecodeError) as e:
+            except ValueError as e:
                 logger.warning(
                     f"Failed to parse GCP credentials from environment: {str(e)}"
                 )
@@ -57,5 +71,5 @@ def get_gcp_credentials():
 
         raise ValueError("No valid GCP credentials found in environment or local file")
     except Exception as e:
-        logger.error(f"Failed to initialize GCP credentials: {str(e)}")
+        logger.error("Failed to initialize GCP credentials: %s", e)
         raise
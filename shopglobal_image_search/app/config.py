@@ -8,6 +8,7 @@ APP_HOST = os.getenv("HOST", "0.0.0.0")
 APP_PORT = os.getenv("PORT", "8080")
 APP_AUTO_RELOAD = os.getenv("AUTO_RELOAD", "False")
 APP_LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+APP_WORKERS = os.getenv("WORKERS", "4")
 GOOGLE_CREDENTIAL = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 GOOGLE_PROJECT_ID = os.getenv("GOOGLE_PROJECT_ID_PROD", "prd-search-shg-api")
 GEMINI_API_LOCATION = os.getenv("GEMINI_API_LOCATION", "global")
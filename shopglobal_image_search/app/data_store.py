@@ -1,7 +1,14 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 from typing import Literal
 import base64
 
+# Deletes the ASCII whitespace of MIME-style line-wrapped base64
+_BASE64_WHITESPACE = str.maketrans("", "", " \t\n\r\f\v")
+
+
+class InvalidBase64Error(ValueError):
+    """Raised by ImageInput when base64_image does not decode"""
+
 
 ########################################################
 # Models
@@ -9,23 +16,40 @@ import base64
 class ImageInput(BaseModel):
     """Input model for image search request."""
 
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {"base64_image": "base64_encoded_string_here", "lang": "th"}
+        }
+    )
+
     base64_image: str = Field(..., description="Base64 encoded image string")
     lang: Literal["th", "en"] = Field(
         default="th", description="Language for the response (th/en)"
     )
 
-    def validate_base64(self) -> bool:
-        """Validate if the base64 string is properly formatted."""
+    _image_data: bytes = PrivateAttr(default=b"")
+
+    @model_validator(mode="after")
+    def decode_base64_image(self) -> "ImageInput":
+        """Decode the image once during request parsing, rejecting bad base64.
+
+        Line breaks and other ASCII whitespace are dropped first, then the
+        strict decode checks the alphabet and padding in the same pass, and
+        the bytes are kept for image_data. Bad input fails validation with an
+        InvalidBase64Error, which the API maps to a 400 response.
+        """
         try:
-            base64.b64decode(self.base64_image)
-            return True
-        except Exception:
-            return False
+            self._image_data = base64.b64decode(
+                self.base64_image.translate(_BASE64_WHITESPACE), validate=True
+            )
+        except ValueError as e:
+            raise InvalidBase64Error("Invalid base64 image format") from e
+        return self
 
-    class Config:
-        json_schema_extra = {
-            "example": {"base64_image": "base64_encoded_string_here", "lang": "th"}
-        }
+    @property
+    def image_data(self) -> bytes:
+        """Decoded image bytes."""
+        return self._image_data
 
 
 class ImageSearchResponse(BaseModel):
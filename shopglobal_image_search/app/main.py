@@ -1,5 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
 import uvicorn
 from app.config import (
@@ -9,9 +11,14 @@ from app.config import (
     APP_PORT,
     APP_AUTO_RELOAD,
     APP_LOG_LEVEL,
+    APP_WORKERS,
 )
 from app.authentications import validate_api_key, get_gcp_credentials
-from app.utils import extract_caption_from_image
+from app.utils import (
+    extract_caption_from_image,
+    init_gemini_model,
+    invalid_image_exception_handler,
+)
 from app.data_store import (
     HealthCheckResponse,
     ImageSearchResponse,
@@ -33,8 +40,13 @@ app = FastAPI(
     title="ShopChannel Image-Search API",
     description="API for extracting product context from images using Gemini Pro Vision.",
     version="0.0.1",
+    default_response_class=ORJSONResponse,
 )
 
+# Undecodable base64 images fail ImageInput validation; answer them with the
+# documented 400 instead of FastAPI's default 422
+app.add_exception_handler(RequestValidationError, invalid_image_exception_handler)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -49,9 +61,12 @@ try:
     credentials = get_gcp_credentials()
     logger.info("Successfully initialized GCP credentials")
 except Exception as e:
-    logger.error(f"Failed to initialize GCP credentials: {str(e)}")
+    logger.error("Failed to initialize GCP credentials: %s", e)
     raise
 
+# Initialize the Gemini model once and reuse it across requests
+gemini_model = init_gemini_model(GOOGLE_PROJECT_ID, credentials)
+
 
 ########################################################
 # API Endpoints
@@ -122,34 +137,38 @@ async def search_by_image(
     ```
     """
     try:
-        logger.info(f"Received image search request with language: {payload.lang}")
+        logger.info("Received image search request with language: %s", payload.lang)
 
         if not payload.base64_image:
             logger.error("No image provided in request")
             raise HTTPException(status_code=400, detail="No image provided")
 
-        if not payload.validate_base64():
-            logger.error("Invalid base64 image format")
-            raise HTTPException(status_code=400, detail="Invalid base64 image format")
-
         logger.info("Processing image with Gemini Pro Vision")
-        caption = extract_caption_from_image(
-            payload.base64_image, GOOGLE_PROJECT_ID, payload.lang, credentials
+        caption = await extract_caption_from_image(
+            payload.image_data, gemini_model, payload.lang
         )
-        logger.info(f"Successfully generated caption: {caption}")
+        logger.info("Successfully generated caption: %s", caption)
 
         return {"text": caption, "lang": payload.lang}
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 400)
+        raise
     except Exception as e:
-        logger.error(f"Image analysis failed: {str(e)}", exc_info=True)
+        logger.error("Image analysis failed: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Image analysis failed: {str(e)}")
 
 
 if __name__ == "__main__":
     # Run the FastAPI application using uvicorn
+    reload = APP_AUTO_RELOAD.lower() == "true"
     uvicorn.run(
         "app.main:app",
         host=APP_HOST,
         port=int(APP_PORT),
-        reload=bool(APP_AUTO_RELOAD),  # Enable auto-reload during development
+        reload=reload,  # Enable auto-reload during development
         log_level=APP_LOG_LEVEL,
+        # The reloader runs a single process, so workers only apply without it
+        workers=1 if reload else int(APP_WORKERS),
+        loop="uvloop",
+        http="httptools",
     )
@@ -1,7 +1,9 @@
+import asyncio
 import logging
-from fastapi import HTTPException
-import base64
-import logging
+from fastapi import HTTPException, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
 from typing import Tuple
 import vertexai
 from vertexai.preview.generative_models import GenerativeModel, Part
@@ -13,21 +15,31 @@ from app.config import (
     GEMINI_API_LOCATION,
     GEMINI_API_MODEL
 )
+from app.data_store import InvalidBase64Error
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
 ########################################################
 # Functions
 ########################################################
-def get_image_size_mb(base64_image: str) -> float:
-    """Calculate approximate image size in MB from base64 string."""
-    size_mb = (len(base64_image) * 0.75) / (1024 * 1024)
-    logger.info(f"Base64 string length: {len(base64_image)} bytes")
-    logger.info(f"Approximate image size: {size_mb:.2f}MB")
+async def invalid_image_exception_handler(
+    request: Request, exc: RequestValidationError
+):
+    """Answer undecodable base64 images with a 400, other validation errors as usual."""
+    for error in exc.errors():
+        if isinstance(error.get("ctx", {}).get("error"), InvalidBase64Error):
+            logger.error("Invalid base64 image format")
+            return ORJSONResponse(
+                status_code=400, content={"detail": "Invalid base64 image format"}
+            )
+    return await request_validation_exception_handler(request, exc)
+
+
+def get_image_size_mb(image_data: bytes) -> float:
+    """Calculate image size in MB from the decoded image bytes."""
+    size_mb = len(image_data) / (1024 * 1024)
+    logger.info("Image size: %.2fMB", size_mb)
     return size_mb
 
 
@@ -55,62 +67,74 @@ def resize_image_if_needed(
         image = Image.open(io.BytesIO(image_data))
         original_format = image.format or "JPEG"
         original_size = len(image_data)
-        logger.info(f"Original image format: {original_format}")
-        logger.info(f"Original image dimensions: {image.size}")
-        logger.info(f"Original image size: {original_size / (1024 * 1024):.2f}MB")
+        logger.info("Original image format: %s", original_format)
+        logger.info("Original image dimensions: %s", image.size)
+        logger.info("Original image size: %.2fMB", original_size / (1024 * 1024))
 
         # Calculate new dimensions while maintaining aspect ratio
         max_size_bytes = max_size_mb * 1024 * 1024
         ratio = (max_size_bytes / original_size) ** 0.5
         new_size = tuple(int(dim * ratio) for dim in image.size)
-        logger.info(f"Resizing image to {new_size}")
+        logger.info("Resizing image to %s", new_size)
+
+        # For JPEGs, let libjpeg decode straight to a reduced scale near the
+        # target size instead of decoding the full image first
+        if original_format == "JPEG":
+            image.draft("RGB", new_size)
 
         # Resize image
-        image = image.resize(new_size, Image.Resampling.LANCZOS)
+        image.thumbnail(new_size, Image.Resampling.LANCZOS)
         output = io.BytesIO()
         image.save(output, format=original_format, quality=TARGET_IMAGE_QUALITY)
 
         resized_data = output.getvalue()
         final_size = len(resized_data)
-        logger.info(f"Final image size: {final_size / (1024 * 1024):.2f}MB")
+        logger.info("Final image size: %.2fMB", final_size / (1024 * 1024))
 
         mime_type = get_mime_type(original_format)
-        logger.info(f"Final image format: {original_format} (MIME: {mime_type})")
+        logger.info("Final image format: %s (MIME: %s)", original_format, mime_type)
         return resized_data, mime_type
 
     except Exception as e:
-        logger.error(f"Error resizing image: {str(e)}", exc_info=True)
+        logger.error("Error resizing image: %s", e, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
 
-def extract_caption_from_image(
-    base64_image: str, project_id: str, lang: str = "th", credentials: str = None
+def init_gemini_model(project_id: str, credentials: str = None) -> GenerativeModel:
+    """Initialize Vertex AI and load the Gemini model, once per process."""
+    logger.info(
+        "Initializing Vertex AI with project: %s, location: %s",
+        project_id,
+        GEMINI_API_LOCATION,
+    )
+    vertexai.init(
+        project=project_id, location=GEMINI_API_LOCATION, credentials=credentials
+    )
+
+    logger.info("Loading model: %s", GEMINI_API_MODEL)
+    return GenerativeModel(GEMINI_API_MODEL)
+
+
+async def extract_caption_from_image(
+    image_data: bytes, model: GenerativeModel, lang: str = "th"
 ) -> str:
     """Extract caption from image using Gemini Pro Vision model."""
     try:
-        # Check image size from base64 string
-        image_size_mb = get_image_size_mb(base64_image)
-
-        # Decode base64 to bytes
-        image_data = base64.b64decode(base64_image)
+        # Check image size
+        image_size_mb = get_image_size_mb(image_data)
         mime_type = "image/jpeg"  # Default mime type
 
         # Resize if needed
         if image_size_mb > MAX_IMAGE_SIZE_MB:
             logger.info(
-                f"Image size {image_size_mb:.2f}MB exceeds limit {MAX_IMAGE_SIZE_MB}MB, resizing..."
+                "Image size %.2fMB exceeds limit %sMB, resizing...",
+                image_size_mb,
+                MAX_IMAGE_SIZE_MB,
+            )
+            # Resizing is CPU-bound, so keep it off the event loop
+            image_data, mime_type = await asyncio.to_thread(
+                resize_image_if_needed, image_data
             )
-            image_data, mime_type = resize_image_if_needed(image_data)
-
-        logger.info(
-            f"Initializing Vertex AI with project: {project_id}, location: {GEMINI_API_LOCATION}"
-        )
-        vertexai.init(
-            project=project_id, location=GEMINI_API_LOCATION, credentials=credentials
-        )
-
-        logger.info(f"Loading model: {GEMINI_API_MODEL}")
-        model = GenerativeModel(GEMINI_API_MODEL)
 
         image_part = Part.from_data(mime_type=mime_type, data=image_data)
 
@@ -127,8 +151,8 @@ def extract_caption_from_image(
             else " Please respond in English language only."
         )
 
-        logger.info(f"Generating content with model in {lang} language")
-        response = model.generate_content([prompt, image_part])
+        logger.info("Generating content with model in %s language", lang)
+        response = await model.generate_content_async([prompt, image_part])
         caption = response.text.strip() if response.text else ""
 
         # Normalize to lowercase for fallback check
@@ -144,5 +168,5 @@ def extract_caption_from_image(
         logger.info("Successfully generated response")
         return caption
     except Exception as e:
-        logger.error(f"Failed to extract caption: {str(e)}", exc_info=True)
+        logger.error("Failed to extract caption: %s", e, exc_info=True)
         raise
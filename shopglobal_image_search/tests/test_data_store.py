@@ -0,0 +1,61 @@
+"""Tests for ImageInput base64 decoding. Run with `python -m pytest tests` from shopglobal_image_search."""
+import base64
+import textwrap
+
+import pytest
+from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.data_store import ImageInput
+from app.utils import invalid_image_exception_handler
+
+IMAGE_BYTES = bytes(range(256)) * 4
+IMAGE_BASE64 = base64.b64encode(IMAGE_BYTES).decode()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_exception_handler(RequestValidationError, invalid_image_exception_handler)
+
+    @app.post("/decode")
+    async def decode(payload: ImageInput):
+        return {"size": len(payload.image_data)}
+
+    return TestClient(app)
+
+
+def test_decodes_plain_base64():
+    assert ImageInput(base64_image=IMAGE_BASE64).image_data == IMAGE_BYTES
+
+
+@pytest.mark.parametrize("separator", ["\n", "\r\n"])
+def test_decodes_line_wrapped_base64(separator):
+    wrapped = separator.join(textwrap.wrap(IMAGE_BASE64, 76)) + separator
+    assert ImageInput(base64_image=wrapped).image_data == IMAGE_BYTES
+
+
+@pytest.mark.parametrize("bad", ["@@@", "abc", "ภาพ"])
+def test_invalid_base64_fails_validation(bad):
+    with pytest.raises(ValidationError, match="Invalid base64 image format"):
+        ImageInput(base64_image=bad)
+
+
+def test_invalid_base64_request_returns_400(client):
+    response = client.post("/decode", json={"base64_image": "@@@"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid base64 image format"}
+
+
+def test_other_validation_errors_keep_422(client):
+    response = client.post("/decode", json={"base64_image": IMAGE_BASE64, "lang": "fr"})
+    assert response.status_code == 422
+
+
+def test_wrapped_base64_request_is_accepted(client):
+    wrapped = "\n".join(textwrap.wrap(IMAGE_BASE64, 76))
+    response = client.post("/decode", json={"base64_image": wrapped})
+    assert response.status_code == 200
+    assert response.json() == {"size": len(IMAGE_BYTES)}
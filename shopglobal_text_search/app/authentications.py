@@ -6,10 +6,6 @@ import logging
 from google.oauth2 import service_account
 from app.config import API_KEY, GCP_CREDENTIALS_FILE, GOOGLE_CREDENTIAL
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 # API Key Configuration
@@ -1,15 +1,18 @@
 from dotenv import load_dotenv
 import os
-from google.oauth2 import service_account
-from google.cloud import discoveryengine_v1
 
-load_dotenv()
+# Parse .env once; worker processes inherit the loaded environment
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv(override=False)
+    os.environ["_DOTENV_LOADED"] = "1"
 
 # Environment variables
 APP_HOST = os.getenv("HOST", "0.0.0.0")
 APP_PORT = os.getenv("PORT", "8080")
 APP_AUTO_RELOAD = os.getenv("AUTO_RELOAD", "False")
 APP_LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+APP_WORKERS = os.getenv("WORKERS", "1")
+APP_ENABLE_DOCS = os.getenv("ENABLE_DOCS", "True").lower() == "true"
 GOOGLE_CREDENTIAL = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 GOOGLE_PROJECT_ID = os.getenv("GOOGLE_PROJECT_ID_PROD", "prd-search-shg-api")
 GOOGLE_LOCATION = os.getenv("GOOGLE_LOCATION", "global")
@@ -26,6 +29,15 @@ GCP_CREDENTIALS_FILE = os.getenv(
     "./app/prd-search-shg-api-d3bc1167b44a.json",
 )
 ID_SEARCH_URL = "https://shopchannel-id-search-891706886553.asia-southeast1.run.app/api/search-by-id"
+ID_LOOKUP_TIMEOUT_SECONDS = float(os.getenv("ID_LOOKUP_TIMEOUT_SECONDS", "10"))
+ID_LOOKUP_CACHE_TTL_SECONDS = int(os.getenv("ID_LOOKUP_CACHE_TTL_SECONDS", "300"))
+ID_LOOKUP_CACHE_MAX_SIZE = int(os.getenv("ID_LOOKUP_CACHE_MAX_SIZE", "4096"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "2"))
+SEARCH_CACHE_MAX_SIZE = int(os.getenv("SEARCH_CACHE_MAX_SIZE", "1024"))
+SEARCH_BREAKER_THRESHOLD = int(os.getenv("SEARCH_BREAKER_THRESHOLD", "5"))
+SEARCH_BREAKER_COOLDOWN_SECONDS = float(os.getenv("SEARCH_BREAKER_COOLDOWN_SECONDS", "10"))
+SEARCH_WARMUP_TIMEOUT_SECONDS = float(os.getenv("SEARCH_WARMUP_TIMEOUT_SECONDS", "5"))
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "32"))
 
 # Constants
 MAX_QUERY_LENGTH = 1000
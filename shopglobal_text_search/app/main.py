@@ -1,7 +1,18 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from contextlib import asynccontextmanager
+from cachetools import TTLCache
+from fastapi import FastAPI, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
+import asyncio
+import atexit
+import hashlib
 import logging
+import logging.handlers
+import orjson
+import queue
 import uvicorn
+from google.cloud import discoveryengine
+from typing import Annotated, Any, Dict, List, Optional, Tuple
 from app.config import (
     CORS_ALLOW_ORIGINS,
     DEFAULT_PAGE_SIZE,
@@ -12,12 +23,20 @@ from app.config import (
     APP_PORT,
     APP_AUTO_RELOAD,
     APP_LOG_LEVEL,
+    APP_WORKERS,
+    APP_ENABLE_DOCS,
+    SEARCH_CACHE_TTL_SECONDS,
+    SEARCH_CACHE_MAX_SIZE,
+    SEARCH_WARMUP_TIMEOUT_SECONDS,
 )
 from app.authentications import validate_api_key, get_gcp_credentials
 from app.utils import (
     perform_search,
     transform_to_flatsome_json,
     get_product_name_from_id,
+    ID_SEARCH_CLIENT,
+    search_circuit_open,
+    SearchCircuitOpenError,
 )
 from app.data_store import (
     HealthCheckResponse,
@@ -27,42 +46,257 @@ from app.data_store import (
 )
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+class JsonLogFormatter(logging.Formatter):
+    """Format each record as one JSON line that Cloud Logging can parse"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return orjson.dumps(
+            {
+                "ts": record.created,
+                "severity": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+            }
+        ).decode()
+
+
+# Handlers only enqueue records; a background listener thread formats and writes
+# them, so request handlers never block on stream I/O
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(JsonLogFormatter())
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# The queued record carries the bare message, with any traceback appended
+_log_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+logging.basicConfig(level=logging.INFO, handlers=[_log_queue_handler])
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 
 ########################################################
 # FastAPI Setup
 ########################################################
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load credentials and create one async search client per worker"""
+    # A failure here aborts worker startup instead of leaving a broken worker
+    try:
+        app.state.credentials = await asyncio.to_thread(get_gcp_credentials)
+    except Exception:
+        logger.exception("Failed to initialize GCP credentials")
+        raise
+    # Created inside the running loop so the gRPC channel binds to it
+    app.state.search_client = discoveryengine.SearchServiceAsyncClient(
+        credentials=app.state.credentials
+    )
+    # Connect the gRPC channel before serving so the first search doesn't pay
+    # for DNS, TLS and HTTP/2 setup; a slow connect only delays that search
+    if SEARCH_WARMUP_TIMEOUT_SECONDS > 0:
+        try:
+            await asyncio.wait_for(
+                app.state.search_client.transport.grpc_channel.channel_ready(),
+                timeout=SEARCH_WARMUP_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Search channel not ready after {SEARCH_WARMUP_TIMEOUT_SECONDS}s, connecting on first search"
+            )
+    yield
+    await app.state.search_client.transport.close()
+    await ID_SEARCH_CLIENT.aclose()
+
+
 app = FastAPI(
     title="ShopChannel Text-Search API",
     description="API for searching products by natural language text. Using Google Vertex AI Search. Supports both Thai and English queries.",
     version="0.0.1",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    # Skip the docs routes and OpenAPI schema build when docs are disabled
+    docs_url="/docs" if APP_ENABLE_DOCS else None,
+    redoc_url="/redoc" if APP_ENABLE_DOCS else None,
+    openapi_url="/openapi.json" if APP_ENABLE_DOCS else None,
 )
 
 # CORS Configuration
+# CORS_ALLOW_ORIGINS is a comma-separated list, parsed once here. Credentials are
+# only allowed for explicit origins; with "*" Starlette can answer with a plain
+# wildcard instead of echoing each request's origin.
+CORS_ORIGINS = [origin.strip() for origin in CORS_ALLOW_ORIGINS.split(",") if origin.strip()]
+CORS_ALLOW_ALL = "*" in CORS_ORIGINS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[CORS_ALLOW_ORIGINS],
-    allow_credentials=True,
+    allow_origins=["*"] if CORS_ALLOW_ALL else CORS_ORIGINS,
+    allow_credentials=not CORS_ALLOW_ALL,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
 
-# Initialize credentials
-try:
-    credentials = get_gcp_credentials()
-except Exception as e:
-    logger.error(f"Failed to initialize GCP credentials: {str(e)}")
-    raise HTTPException(status_code=500, detail="Failed to initialize GCP credentials")
+# Identical searches running at the same time share one upstream call, and its
+# result is reused for SEARCH_CACHE_TTL_SECONDS afterwards
+_INFLIGHT_SEARCHES: Dict[tuple, asyncio.Task] = {}
+SEARCH_RESULT_CACHE: TTLCache = TTLCache(
+    maxsize=SEARCH_CACHE_MAX_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS
+)
+
+
+async def _run_search(
+    query: str,
+    page_size: int,
+    page: int,
+    cat: Optional[str],
+    lo_price: Optional[float],
+    hi_price: Optional[float],
+    api_key: str,
+    search_client: discoveryengine.SearchServiceAsyncClient,
+) -> Tuple[str, List[Dict[str, Any]], int, int]:
+    """Run a search, coalescing identical concurrent and recent requests.
+
+    Shared by both search endpoints, which differ only in how they format the
+    results. Returns the effective query with the search results and counts.
+    """
+    key = (query, page_size, page, cat, lo_price, hi_price)
+    cached = SEARCH_RESULT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    task = _INFLIGHT_SEARCHES.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _search_uncached(key, api_key, search_client)
+        )
+        _INFLIGHT_SEARCHES[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT_SEARCHES.pop(key, None))
+    # Shielded so one client disconnecting does not cancel the shared search
+    return await asyncio.shield(task)
+
+
+async def _search_uncached(
+    key: tuple,
+    api_key: str,
+    search_client: discoveryengine.SearchServiceAsyncClient,
+) -> Tuple[str, List[Dict[str, Any]], int, int]:
+    """Resolve a numeric product ID query to its product name, then run the search."""
+    query, page_size, page, cat, lo_price, hi_price = key
+    # Gate only real upstream calls; cached and in-flight results are still served
+    if search_circuit_open():
+        raise SearchCircuitOpenError("Search circuit is open")
+    if query.isdigit():
+        query = await get_product_name_from_id(query, api_key)
+        if query == "":
+            raise Exception("No product found from the query ID")
+    results, total_results, total_pages = await perform_search(
+        query,
+        page_size,
+        page,
+        search_client,
+        category=cat,
+        lo_price=lo_price,
+        hi_price=hi_price,
+    )
+    SEARCH_RESULT_CACHE[key] = (query, results, total_results, total_pages)
+    return query, results, total_results, total_pages
+
+
+# ETag of the last response body per endpoint and search parameters, so a
+# matching If-None-Match is answered with 304 before any search runs
+SEARCH_ETAG_CACHE: TTLCache = TTLCache(
+    maxsize=SEARCH_CACHE_MAX_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS
+)
+SEARCH_CACHE_CONTROL = f"private, max-age={int(SEARCH_CACHE_TTL_SECONDS)}"
+
+# Built once and returned for every failed search, so an upstream outage does not
+# add per-request error formatting and serialization on top
+SEARCH_FAILED_RESPONSE = ORJSONResponse(
+    status_code=500, content={"detail": "Search operation failed"}
+)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header lists the ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def _not_modified_response(request: Request, cache_key: tuple) -> Optional[Response]:
+    """Return a 304 if the client already holds the current response"""
+    etag = SEARCH_ETAG_CACHE.get(cache_key)
+    if etag is None or not _etag_matches(request, etag):
+        return None
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": SEARCH_CACHE_CONTROL}
+    )
+
+
+def _etag_response(request: Request, cache_key: tuple, payload: Dict[str, Any]) -> Response:
+    """Serialize the payload once and return it with an ETag, or a 304 on match"""
+    body = orjson.dumps(payload)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    SEARCH_ETAG_CACHE[cache_key] = etag
+    headers = {"ETag": etag, "Cache-Control": SEARCH_CACHE_CONTROL}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 ########################################################
 # API Endpoints
 ########################################################
+# Query parameters shared by both search endpoints
+SearchQueryParam = Annotated[
+    str,
+    Query(
+        description="Search query text (supports both Thai and English)",
+        examples="เสื้อผ้าผู้ชาย",
+        min_length=MIN_QUERY_LENGTH,
+        max_length=MAX_QUERY_LENGTH,
+    ),
+]
+PageSizeParam = Annotated[
+    int,
+    Query(
+        description="Number of results per page",
+        ge=1,
+        le=MAX_PAGE_SIZE,
+    ),
+]
+PageParam = Annotated[
+    int,
+    Query(
+        description="Page number (1-based)",
+        ge=1,
+    ),
+]
+CategoryParam = Annotated[
+    str,
+    Query(
+        description="Category filter to narrow down search results. Matches any level in category hierarchy.",
+        examples="ผู้หญิง",
+    ),
+]
+LoPriceParam = Annotated[
+    float,
+    Query(
+        description="Minimum price filter (inclusive). Uses sale_price if available, otherwise regular_price.",
+        examples=1000,
+        ge=0,
+    ),
+]
+HiPriceParam = Annotated[
+    float,
+    Query(
+        description="Maximum price filter (inclusive). Uses sale_price if available, otherwise regular_price.",
+        examples=5000,
+        ge=0,
+    ),
+]
+
+
 @app.get(
     "/",
     response_model=HealthCheckResponse,
@@ -104,41 +338,13 @@ async def health_check():
     },
 )
 async def search_products(
-    query: str = Query(
-        ...,
-        description="Search query text (supports both Thai and English)",
-        examples="เสื้อผ้าผู้ชาย",
-        min_length=MIN_QUERY_LENGTH,
-        max_length=MAX_QUERY_LENGTH,
-    ),
-    page_size: int = Query(
-        DEFAULT_PAGE_SIZE,
-        description="Number of results per page",
-        ge=1,
-        le=MAX_PAGE_SIZE,
-    ),
-    page: int = Query(
-        1,
-        description="Page number (1-based)",
-        ge=1,
-    ),
-    cat: str = Query(
-        None,
-        description="Category filter to narrow down search results. Matches any level in category hierarchy.",
-        examples="ผู้หญิง",
-    ),
-    lo_price: float = Query(
-        None,
-        description="Minimum price filter (inclusive). Uses sale_price if available, otherwise regular_price.",
-        examples=1000,
-        ge=0,
-    ),
-    hi_price: float = Query(
-        None,
-        description="Maximum price filter (inclusive). Uses sale_price if available, otherwise regular_price.",
-        examples=5000,
-        ge=0,
-    ),
+    request: Request,
+    query: SearchQueryParam,
+    page_size: PageSizeParam = DEFAULT_PAGE_SIZE,
+    page: PageParam = 1,
+    cat: CategoryParam = None,
+    lo_price: LoPriceParam = None,
+    hi_price: HiPriceParam = None,
     api_key: str = Depends(validate_api_key),
 ):
     """
@@ -226,32 +432,40 @@ async def search_products(
     }
     ```
     """
+    cache_key = (request.url.path, query, page_size, page, cat, lo_price, hi_price)
+    not_modified = _not_modified_response(request, cache_key)
+    if not_modified is not None:
+        return not_modified
     try:
-        if query.isdigit():
-            query = get_product_name_from_id(query, api_key)
-            if query == "":
-                raise Exception("No product found from the query ID")
-        results, total_results, total_pages = await perform_search(
+        query, results, total_results, total_pages = await _run_search(
             query,
             page_size,
             page,
-            credentials,
-            category=cat,
-            lo_price=lo_price,
-            hi_price=hi_price,
+            cat,
+            lo_price,
+            hi_price,
+            api_key,
+            request.app.state.search_client,
         )
-        return {
-            "query": query,
-            "results": results,
-            "total_results": total_results,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Search operation failed: {str(e)}"
+        # Results are plain dicts built by perform_search, so return the response
+        # directly and skip FastAPI's jsonable_encoder and response_model passes
+        return _etag_response(
+            request,
+            cache_key,
+            {
+                "query": query,
+                "results": results,
+                "total_results": total_results,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": total_pages,
+            },
         )
+    except SearchCircuitOpenError:
+        return SEARCH_FAILED_RESPONSE
+    except Exception:
+        logger.exception("Search operation failed")
+        return SEARCH_FAILED_RESPONSE
 
 
 @app.get(
@@ -266,41 +480,13 @@ async def search_products(
     },
 )
 async def search_products_wp(
-    query: str = Query(
-        ...,
-        description="Search query text (supports both Thai and English)",
-        examples="เสื้อผ้าผู้ชาย",
-        min_length=MIN_QUERY_LENGTH,
-        max_length=MAX_QUERY_LENGTH,
-    ),
-    page_size: int = Query(
-        DEFAULT_PAGE_SIZE,
-        description="Number of results per page",
-        ge=1,
-        le=MAX_PAGE_SIZE,
-    ),
-    page: int = Query(
-        1,
-        description="Page number (1-based)",
-        ge=1,
-    ),
-    cat: str = Query(
-        None,
-        description="Category filter to narrow down search results. Matches any level in category hierarchy.",
-        examples="ผู้หญิง",
-    ),
-    lo_price: float = Query(
-        None,
-        description="Minimum price filter (inclusive). Uses sale_price if available, otherwise regular_price.",
-        examples=1000,
-        ge=0,
-    ),
-    hi_price: float = Query(
-        None,
-        description="Maximum price filter (inclusive). Uses sale_price if available, otherwise regular_price.",
-        examples=5000,
-        ge=0,
-    ),
+    request: Request,
+    query: SearchQueryParam,
+    page_size: PageSizeParam = DEFAULT_PAGE_SIZE,
+    page: PageParam = 1,
+    cat: CategoryParam = None,
+    lo_price: LoPriceParam = None,
+    hi_price: HiPriceParam = None,
     api_key: str = Depends(validate_api_key),
 ):
     """
@@ -382,35 +568,47 @@ async def search_products_wp(
     }
     ```
     """
+    cache_key = (request.url.path, query, page_size, page, cat, lo_price, hi_price)
+    not_modified = _not_modified_response(request, cache_key)
+    if not_modified is not None:
+        return not_modified
     try:
-        if query.isdigit():
-            query = get_product_name_from_id(query, api_key)
-            if query == "":
-                raise Exception("No product found from the query ID")
-        results, total_results, total_pages = await perform_search(
+        query, results, total_results, total_pages = await _run_search(
             query,
             page_size,
             page,
-            credentials,
-            category=cat,
-            lo_price=lo_price,
-            hi_price=hi_price,
-        )
-        return transform_to_flatsome_json(
-            results, total_results, page, page_size, total_pages
+            cat,
+            lo_price,
+            hi_price,
+            api_key,
+            request.app.state.search_client,
         )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Search operation failed: {str(e)}"
+        return _etag_response(
+            request,
+            cache_key,
+            transform_to_flatsome_json(
+                results, total_results, page, page_size, total_pages
+            ),
         )
+    except SearchCircuitOpenError:
+        return SEARCH_FAILED_RESPONSE
+    except Exception:
+        logger.exception("Search operation failed")
+        return SEARCH_FAILED_RESPONSE
 
 
 if __name__ == "__main__":
     # Run the FastAPI application using uvicorn
+    reload = APP_AUTO_RELOAD.lower() == "true"
     uvicorn.run(
         "app.main:app",
         host=APP_HOST,
         port=int(APP_PORT),
-        reload=bool(APP_AUTO_RELOAD),  # Enable auto-reload during development
+        reload=reload,  # Enable auto-reload during development
         log_level=APP_LOG_LEVEL,
+        # The reloader runs a single process, so workers only apply without it
+        workers=1 if reload else int(APP_WORKERS),
+        loop="uvloop",
+        http="httptools",
+        timeout_keep_alive=30,
     )
@@ -1,30 +1,97 @@
+import asyncio
 import logging
 import re
+import time
+import orjson
+from functools import lru_cache
+import httpx
+from cachetools import TTLCache
 from fastapi import HTTPException
+from google.api_core import exceptions as core_exceptions
 from google.cloud import discoveryengine
+from google.protobuf.json_format import MessageToDict
 from typing import List, Dict, Any, Optional
-import json
-import requests
 from app.config import (
     SEARCH_SERVING_CONFIG,
     MAX_PAGE_SIZE,
     DEFAULT_PAGE_SIZE,
     ID_SEARCH_URL,
+    ID_LOOKUP_TIMEOUT_SECONDS,
+    ID_LOOKUP_CACHE_TTL_SECONDS,
+    ID_LOOKUP_CACHE_MAX_SIZE,
+    SEARCH_BREAKER_THRESHOLD,
+    SEARCH_BREAKER_COOLDOWN_SECONDS,
+    SEARCH_MAX_CONCURRENCY,
 )
 
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Shared client so ID lookups reuse pooled keep-alive connections to the id
+# search service, and a short-lived cache of product names by ID
+ID_SEARCH_CLIENT = httpx.AsyncClient(
+    timeout=ID_LOOKUP_TIMEOUT_SECONDS,
+    limits=httpx.Limits(max_keepalive_connections=32),
+)
+ID_NAME_CACHE: TTLCache = TTLCache(
+    maxsize=ID_LOOKUP_CACHE_MAX_SIZE, ttl=ID_LOOKUP_CACHE_TTL_SECONDS
+)
+# Per-process hit/miss counts, logged with each lookup to tune the cache size/TTL
+ID_NAME_CACHE_STATS = {"hits": 0, "misses": 0}
+
+# Circuit breaker for Vertex AI Search: after SEARCH_BREAKER_THRESHOLD consecutive
+# failures, searches fail fast for SEARCH_BREAKER_COOLDOWN_SECONDS instead of
+# piling more requests onto a failing backend
+_search_failures = 0
+_search_open_until = 0.0
+# Only upstream-side errors count towards opening the breaker; client errors
+# such as InvalidArgument come from the request, not from backend health
+_TRANSIENT_SEARCH_ERRORS = (
+    core_exceptions.ServiceUnavailable,
+    core_exceptions.DeadlineExceeded,
+    core_exceptions.InternalServerError,
+    core_exceptions.ResourceExhausted,
+)
+
+# Caps in-flight Vertex AI Search RPCs per worker so load spikes queue here
+# instead of opening ever more concurrent streams on the shared channel
+_SEARCH_SEMAPHORE = asyncio.Semaphore(SEARCH_MAX_CONCURRENCY)
+
+
+class SearchCircuitOpenError(Exception):
+    """Raised instead of calling Vertex AI Search while the breaker is open"""
+
+
+def search_circuit_open() -> bool:
+    """Check whether searches should currently fail fast"""
+    return time.monotonic() < _search_open_until
+
+
+def _record_search_outcome(succeeded: bool) -> None:
+    """Reset the breaker on success, or count a failure and open it at the threshold"""
+    global _search_failures, _search_open_until
+    if succeeded:
+        _search_failures = 0
+        return
+    _search_failures += 1
+    if _search_failures >= SEARCH_BREAKER_THRESHOLD:
+        _search_open_until = time.monotonic() + SEARCH_BREAKER_COOLDOWN_SECONDS
+        logger.warning(
+            f"Search circuit opened for {SEARCH_BREAKER_COOLDOWN_SECONDS}s after {_search_failures} consecutive failures"
+        )
+
+
+# HTML tags, or any character outside word characters, whitespace, Thai and "-.,".
+# One alternation removes both in a single scan with the same result as running
+# the tag pass first, since tag matches are tried first at each position.
+_QUERY_SANITIZE_RE = re.compile(r"<[^>]+>|[^\w\s\u0E00-\u0E7F\-.,]")
+
 
 def sanitize_query(query: str) -> str:
     """Sanitize search query to prevent injection attacks"""
     try:
         # Remove any HTML tags and dangerous characters
-        query = re.sub(r"<[^>]+>", "", query)
-        query = re.sub(r"[^\w\s\u0E00-\u0E7F\-.,]", "", query)
+        query = _QUERY_SANITIZE_RE.sub("", query)
         sanitized = query.strip()
         if not sanitized:
             raise ValueError("Empty query after sanitization")
@@ -43,6 +110,22 @@ def validate_page_size(page_size: int) -> int:
         raise HTTPException(status_code=400, detail="Invalid page size")
 
 
+@lru_cache(maxsize=4096)
+def _category_levels(category: str) -> frozenset:
+    """
+    Collect every lowercased level of every path in a category string.
+
+    Products share a small set of category strings, so each one is parsed once
+    per process. Matching a filter against any path is a single set lookup.
+    """
+    return frozenset(
+        level.strip().lower()
+        # Split by comma to get individual category paths, then by '>' for levels
+        for path in category.split(",")
+        for level in path.split(">")
+    )
+
+
 def filter_by_category(
     results: List[Dict[str, Any]], category_filter: str
 ) -> List[Dict[str, Any]]:
@@ -65,28 +148,11 @@ def filter_by_category(
         return results
 
     category_filter = category_filter.strip().lower()
-    filtered_results = []
-
-    for result in results:
-        category = result.get("category", "")
-        if not category:
-            continue
-
-        # Split by comma to get individual category paths
-        category_paths = [path.strip() for path in category.split(",")]
-
-        # Check each category path
-        for path in category_paths:
-            if not path:
-                continue
-
-            # Split by '>' to get category hierarchy levels
-            category_levels = [level.strip().lower() for level in path.split(">")]
-
-            # Check if filter matches any level in this path
-            if category_filter in category_levels:
-                filtered_results.append(result)
-                break  # Found match, no need to check other paths for this result
+    filtered_results = [
+        result
+        for result in results
+        if category_filter in _category_levels(result.get("category") or "")
+    ]
 
     logger.info(
         f"Category filter '{category_filter}' matched {len(filtered_results)} out of {len(results)} results"
@@ -162,28 +228,92 @@ def filter_by_price_range(
     return filtered_results
 
 
-def get_product_name_from_id(id: str, api_key: str) -> str:
-    url = ID_SEARCH_URL
+def _id_cache_hit_ratio() -> float:
+    """Fraction of product-name lookups served from ID_NAME_CACHE"""
+    lookups = ID_NAME_CACHE_STATS["hits"] + ID_NAME_CACHE_STATS["misses"]
+    return ID_NAME_CACHE_STATS["hits"] / lookups if lookups else 0.0
+
+
+async def get_product_name_from_id(id: str, api_key: str) -> str:
+    """Look up a product name by product number through the id search service"""
+    cached = ID_NAME_CACHE.get(id)
+    if cached is not None:
+        ID_NAME_CACHE_STATS["hits"] += 1
+        logger.info(
+            "Served product name for id %s from cache (hit ratio %.2f)",
+            id,
+            _id_cache_hit_ratio(),
+        )
+        return cached
+    ID_NAME_CACHE_STATS["misses"] += 1
+
     headers = {"X-API-Key": api_key}
     params = {"id": id}
-    logger.info(f"Searching for product name from id: {str(id)}")
+    logger.info(
+        "Searching for product name from id: %s (hit ratio %.2f)",
+        id,
+        _id_cache_hit_ratio(),
+    )
     try:
-        response = requests.request("GET", url, headers=headers, params=params, data="")
+        response = await ID_SEARCH_CLIENT.get(ID_SEARCH_URL, headers=headers, params=params)
+        resp_dict = orjson.loads(response.content)
     except Exception as e:
-        logger.error(f"ID search failed: {str(e)}")
-    resp_dict = json.loads(response.text)
+        logger.error("ID search failed: %s", e)
+        return ""
 
-    if "product_name" in resp_dict:
-        return resp_dict["product_name"]
-    else:
+    # A proxy or error page can decode to JSON that is not an object
+    if not isinstance(resp_dict, dict):
+        logger.error("ID search returned an unexpected body: %.100s", response.text)
         return ""
+    product_name = resp_dict.get("product_name") or ""
+    if not isinstance(product_name, str):
+        product_name = ""
+    # Only cache definitive answers, not auth or server errors
+    if response.status_code in (200, 404):
+        ID_NAME_CACHE[id] = product_name
+    return product_name
+
+
+def _result_to_product(result: discoveryengine.SearchResponse.SearchResult) -> Dict[str, Any]:
+    """Map a Vertex AI Search result to the API product fields"""
+    document = result.document
+    # Convert the Struct to a plain dict once; each .get on the proto-plus map
+    # would otherwise re-marshal the value
+    data = MessageToDict(type(document).pb(document).struct_data)
+    return {
+        "id": document.id,
+        "record_id": data.get("record_id", ""),
+        "product_number": data.get("product_number", ""),
+        "product_name": data.get("product_name", ""),
+        "image_uri": data.get("image_uri", ""),
+        "description": data.get("description", ""),
+        "product_uri": data.get("custom_uri", ""),
+        "category": data.get("category", ""),
+        "brands": data.get("brands", ""),
+        "regular_price": data.get("regular_price", ""),
+        "sale_price": data.get("sale_price", ""),
+        "is_available": data.get("is_available", 0) == 1,
+    }
+
+
+# struct_data fields read by filter_by_category and filter_by_price_range
+_FILTER_FIELDS = ("category", "regular_price", "sale_price")
+
+
+def _result_filter_fields(result: discoveryengine.SearchResponse.SearchResult) -> Dict[str, Any]:
+    """Read only the filtered fields of a result, keeping the result to materialize later"""
+    document = result.document
+    struct_data = type(document).pb(document).struct_data
+    fields = {key: struct_data[key] for key in _FILTER_FIELDS if key in struct_data}
+    fields["result"] = result
+    return fields
 
 
 async def perform_search(
     query: str,
     page_size: int = DEFAULT_PAGE_SIZE,
     page: int = 1,
-    credentials: str = None,
+    client: discoveryengine.SearchServiceAsyncClient = None,
     category: Optional[str] = None,
     lo_price: Optional[float] = None,
     hi_price: Optional[float] = None,
@@ -199,63 +329,66 @@ async def perform_search(
         if category:
             logger.info(f"With category filter: {category}")
 
-        # Calculate total results first by getting a larger batch
-        # We need to get more results to apply our custom filters (category, price)
-        # since Vertex AI doesn't support these filters natively
-        max_fetch_size = min(
-            1000, MAX_PAGE_SIZE * 10
-        )  # Get up to 1000 or 10 pages worth
-
-        # Initialize client and execute search
-        client = discoveryengine.SearchServiceClient(credentials=credentials)
+        # Category and price are not filterable fields in the data store schema
+        # (category is one comma-joined string, prices are strings), so filtered
+        # searches get a larger batch and apply those filters here. Unfiltered
+        # searches let Vertex AI paginate and count the results.
+        post_filter = bool(category) or lo_price is not None or hi_price is not None
+        if post_filter:
+            fetch_size = min(1000, MAX_PAGE_SIZE * 10)  # Get up to 1000 or 10 pages worth
+            offset = 0
+        else:
+            fetch_size = page_size
+            offset = (page - 1) * page_size
+
+        # Execute search on the shared async client
         request_dict = {
             "serving_config": SEARCH_SERVING_CONFIG,
             "query": query,
-            "page_size": max_fetch_size,
+            "page_size": fetch_size,
+            "offset": offset,
             "query_expansion_spec": {"condition": "AUTO"},
             "spell_correction_spec": {"mode": "AUTO"},
             "language_code": "th",
         }
-        response = client.search(request=request_dict)
-
-        # Process all results
-        all_results = [
-            {
-                "id": res.document.id,
-                "record_id": res.document.struct_data.get("record_id", ""),
-                "product_number": res.document.struct_data.get("product_number", ""),
-                "product_name": res.document.struct_data.get("product_name", ""),
-                "image_uri": res.document.struct_data.get("image_uri", ""),
-                "description": res.document.struct_data.get("description", ""),
-                "product_uri": res.document.struct_data.get("custom_uri", ""),
-                "category": res.document.struct_data.get("category", ""),
-                "brands": res.document.struct_data.get("brands", ""),
-                "regular_price": res.document.struct_data.get("regular_price", ""),
-                "sale_price": res.document.struct_data.get("sale_price", ""),
-                "is_available": res.document.struct_data.get("is_available", 0) == 1,
-            }
-            for res in response.results
-        ]
-
-        logger.info(f"Found {len(all_results)} raw results from search")
-
-        # Apply category filter if provided
-        if category:
-            all_results = filter_by_category(all_results, category)
-
-        # Apply price range filter if provided
-        if lo_price is not None or hi_price is not None:
-            all_results = filter_by_price_range(all_results, lo_price, hi_price)
+        try:
+            async with _SEARCH_SEMAPHORE:
+                response = await client.search(request=request_dict)
+        except _TRANSIENT_SEARCH_ERRORS:
+            _record_search_outcome(False)
+            raise
+        _record_search_outcome(True)
+
+        logger.info(f"Found {len(response.results)} raw results from search")
+
+        if post_filter:
+            # Filter on just the category and price fields so only the rows on
+            # the requested page are fully materialized, while the count still
+            # covers every match in the batch
+            all_results = [_result_filter_fields(res) for res in response.results]
+
+            # Apply category filter if provided
+            if category:
+                all_results = filter_by_category(all_results, category)
+
+            # Apply price range filter if provided
+            if lo_price is not None or hi_price is not None:
+                all_results = filter_by_price_range(all_results, lo_price, hi_price)
+
+            # Get total count after filtering, then apply pagination
+            total_results = len(all_results)
+            start_idx = (page - 1) * page_size
+            end_idx = start_idx + page_size
+            paginated_results = [
+                _result_to_product(row["result"]) for row in all_results[start_idx:end_idx]
+            ]
+        else:
+            # Vertex AI already returned just this page
+            total_results = response.total_size
+            paginated_results = [_result_to_product(res) for res in response.results]
 
-        # Get total count after filtering
-        total_results = len(all_results)
         total_pages = (total_results + page_size - 1) // page_size  # Ceiling division
 
-        # Apply pagination
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_results = all_results[start_idx:end_idx]
-
         logger.info(
             f"Returning page {page}/{total_pages}: {len(paginated_results)} results (total: {total_results})"
         )
@@ -273,8 +406,8 @@ def safe_parse_product_id(product_number: str) -> int:
     Logic:
         1. Trim the string
         2. Split by space and use first element if multiple elements exist
-        3. Try to convert to int
-        4. Return 0 if conversion fails
+        3. Convert to int if it is numeric
+        4. Return 0 otherwise
     """
     try:
         if not product_number:
@@ -295,7 +428,13 @@ def safe_parse_product_id(product_number: str) -> int:
         if not first_part:
             return 0
 
-        # Step 3: Try to convert to int
+        # Step 3: Convert to int only when it looks numeric (digits with an
+        # optional sign and "_" separators, as int() accepts); product numbers
+        # such as "121552*006" are common, and checking first avoids raising
+        # and logging a ValueError for each of them
+        digits = first_part[1:] if first_part[0] in "+-" else first_part
+        if not digits.replace("_", "").isdecimal():
+            return 0
         return int(first_part)
 
     except (ValueError, TypeError, AttributeError):
@@ -339,6 +478,16 @@ def transform_to_flatsome_json(
         raise HTTPException(status_code=500, detail="Failed to format results")
 
 
+# WooCommerce price markup, built once instead of on every format_price_html call
+_PRICE_AMOUNT_OPEN = '<span class="woocommerce-Price-amount amount"><bdi>'
+_PRICE_AMOUNT_CLOSE = "</bdi></span>"
+_CURRENCY_SUFFIX = '&nbsp;<span class="woocommerce-Price-currencySymbol">&#3647;</span>'
+_OOS_HTML = f"{_PRICE_AMOUNT_OPEN}Out of stock{_PRICE_AMOUNT_CLOSE}"
+_UNAVAIL_HTML = f"{_PRICE_AMOUNT_OPEN}Price unavailable{_PRICE_AMOUNT_CLOSE}"
+
+
+# Many products share the same prices, so repeat combinations skip re-rendering
+@lru_cache(maxsize=4096)
 def format_price_html(
     regular_price: str, sale_price: str = "0", is_available: bool = False
 ) -> str:
@@ -347,22 +496,20 @@ def format_price_html(
         regular_price = float(regular_price or "0")
         sale_price = float(sale_price or "0")
 
-        def format_number(num: float) -> str:
-            return f"{num:,.2f}"
-
-        def price_amount_html(price: str) -> str:
-            return f'<span class="woocommerce-Price-amount amount"><bdi>{price}&nbsp;<span class="woocommerce-Price-currencySymbol">&#3647;</span></bdi></span>'
-
         if not is_available or regular_price == 0:
-            return '<span class="woocommerce-Price-amount amount"><bdi>Out of stock</bdi></span>'
+            return _OOS_HTML
 
+        regular_price_str = f"{regular_price:,.2f}"
         if sale_price > 0 and sale_price < regular_price:
-            regular_price_str = format_number(regular_price)
-            sale_price_str = format_number(sale_price)
-            return f'<del aria-hidden="true">{price_amount_html(regular_price_str)}</del> <span class="screen-reader-text">Original price was: {regular_price_str}&nbsp;&#3647;.</span><ins aria-hidden="true">{price_amount_html(sale_price_str)}</ins><span class="screen-reader-text">Current price is: {sale_price_str}&nbsp;&#3647;.</span>'
+            sale_price_str = f"{sale_price:,.2f}"
+            return (
+                f'<del aria-hidden="true">{_PRICE_AMOUNT_OPEN}{regular_price_str}{_CURRENCY_SUFFIX}{_PRICE_AMOUNT_CLOSE}</del> '
+                f'<span class="screen-reader-text">Original price was: {regular_price_str}&nbsp;&#3647;.</span>'
+                f'<ins aria-hidden="true">{_PRICE_AMOUNT_OPEN}{sale_price_str}{_CURRENCY_SUFFIX}{_PRICE_AMOUNT_CLOSE}</ins>'
+                f'<span class="screen-reader-text">Current price is: {sale_price_str}&nbsp;&#3647;.</span>'
+            )
 
-        price_str = format_number(regular_price)
-        return price_amount_html(price_str)
+        return f"{_PRICE_AMOUNT_OPEN}{regular_price_str}{_CURRENCY_SUFFIX}{_PRICE_AMOUNT_CLOSE}"
     except Exception as e:
         logger.error(f"Failed to format price: {str(e)}")
-        return '<span class="woocommerce-Price-amount amount"><bdi>Price unavailable</bdi></span>'
+        return _UNAVAIL_HTML
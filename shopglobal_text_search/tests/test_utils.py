@@ -0,0 +1,29 @@
+"""Tests for result formatting helpers. Run with `python -m pytest tests` from shopglobal_text_search."""
+import pytest
+
+from app.utils import safe_parse_product_id
+
+
+@pytest.mark.parametrize(
+    "product_number, expected",
+    [
+        ("121552", 121552),
+        (" 42 ", 42),
+        ("12 34", 12),
+        ("-5", -5),
+        ("+7", 7),
+        ("1_000", 1000),
+        ("๑๒๓", 123),
+        ("0012", 12),
+    ],
+)
+def test_parses_numbers_int_accepts(product_number, expected):
+    assert safe_parse_product_id(product_number) == expected
+
+
+@pytest.mark.parametrize(
+    "product_number",
+    ["121552*006", "abc", "1.5", "²", "_1", "1__0", "-", "", "   ", None],
+)
+def test_returns_zero_for_non_numeric(product_number):
+    assert safe_parse_product_id(product_number) == 0